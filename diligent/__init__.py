@@ -1,6 +1,7 @@
 __version__ = '0.0.1'
 
-from .diligent import diligent, registry  # noqa
+from .diligent import diligent, registry, load_report  # noqa
 from .messages import message  # noqa
+from .utils import check_deadline, CheckTimeout  # noqa
 
 from . import checks  # noqa
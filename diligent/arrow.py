@@ -0,0 +1,128 @@
+"""
+Support for Arrow tables and memory mapped Arrow IPC / Parquet files
+
+"""
+
+
+def is_arrow_input(data):
+    if isinstance(data, str):
+        return True
+    # Avoid importing pyarrow just to check the type
+    return (type(data).__module__.startswith('pyarrow') and
+            type(data).__name__ == 'Table')
+
+
+def read_table(path, columns=None):
+    """Reads an Arrow IPC (Feather) file memory mapped or a Parquet file
+
+    Selecting columns keeps the columns storing the pandas index.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError('Reading Arrow files requires pyarrow')
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=columns, memory_map=True,
+                             use_pandas_metadata=True)
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    if columns is not None:
+        table = select_columns(table, columns)
+    return table
+
+
+def get_index_columns(table):
+    """Returns the names of the columns storing the pandas index"""
+    metadata = table.schema.pandas_metadata or {}
+    # A RangeIndex is stored as a description instead of a column
+    return [c for c in metadata.get('index_columns', []) if isinstance(c, str)]
+
+
+def select_columns(table, columns):
+    """Selects columns of a table together with its pandas index"""
+    columns = list(columns)
+    index = [c for c in get_index_columns(table) if c not in columns]
+    return table.select(columns + index)
+
+
+def write_table(df, path, metadata=None):
+    """Writes a dataframe to an Arrow IPC file with JSON metadata"""
+    import json
+
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if metadata is not None:
+        table = table.replace_schema_metadata(
+            {'diligent': json.dumps(metadata)})
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_table_metadata(table):
+    import json
+
+    return json.loads(table.schema.metadata[b'diligent'].decode('utf-8'))
+
+
+def filter_table(table, **values):
+    """Keeps the rows of a table whose columns have one of the given values"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    for column, allowed in values.items():
+        if allowed is not None:
+            mask = pc.is_in(table[column], value_set=pa.array(allowed))
+            table = table.filter(mask)
+    return table
+
+
+def table_to_pandas(table):
+    # Keep one block per column so numeric columns without nulls can be
+    # views on the Arrow buffers instead of copies
+    return table.to_pandas(split_blocks=True)
+
+
+def load_arrow(data):
+    """Returns a dataframe and, for files, an ArrowSource for workers"""
+    if isinstance(data, str):
+        source = ArrowSource(data)
+        return table_to_pandas(source.table), source
+    return table_to_pandas(data), None
+
+
+class ArrowSource(object):
+    """Arrow file that workers map themselves instead of unpickling data
+
+    Only the path is pickled. Indexing with a column name returns that
+    column as a series, reading only that column from the file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._table = None
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = read_table(self.path)
+        return self._table
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def __getitem__(self, column):
+        if self._table is None and self.path.endswith('.parquet'):
+            table = read_table(self.path, columns=[column])
+        else:
+            table = select_columns(self.table, [column])
+        return table_to_pandas(table)[column]
+
+    def to_pandas(self):
+        return table_to_pandas(self.table)
@@ -1,3 +1,19 @@
-from .basic import *  # noqa
-from .nelson import *  # noqa
-from .benford import *  # noqa
+"""
+Builtin check plugins
+
+The modules are imported by the registry when their checks are selected,
+see ``DiligentRegistry.load_plugins``.
+
+"""
+from importlib import import_module
+
+PLUGIN_MODULES = ['basic', 'nelson', 'benford', 'sketch']
+
+
+def __getattr__(name):
+    # Keep ``from diligent.checks import count_nan`` working
+    for module_name in PLUGIN_MODULES:
+        module = import_module('.' + module_name, __name__)
+        if name in getattr(module, '__all__', []):
+            return getattr(module, name)
+    raise AttributeError(name)
@@ -1,68 +1,157 @@
 import re
 
+import numpy as np
 import pandas as pd
 
 from .. import registry, message
-from ..utils import is_numeric
+from ..utils import (is_numeric, check_deadline, format_count,
+                     is_dictionary_encodable, factorize, count_codes)
 
 
 __all__ = ['show_data_type', 'count_nan', 'count_zeroes',
            'detect_suspicious_values', 'detect_repdigits', 'duplicate_rows',
+           'duplicate_columns',
            'suspicious_dataset_length',
            'duplicate_values']
 
 
-@registry.register(name='Data Type', tags='basic')
+@registry.register(name='Data Type', tags='basic', sampling='full')
 def show_data_type(series):
     yield '{}'.format(series.dtype)
 
 
-@registry.register(name='Count NaN', tags='basic')
-def count_nan(series):
+@registry.register_grouped(show_data_type)
+def show_data_type_grouped(series, groups):
+    for code in np.unique(groups):
+        yield code, '{}'.format(series.dtype)
+
+
+@registry.register(name='Count NaN', tags='basic', sampling='scale')
+def count_nan(series, population=None):
     nan_count = len(series[series.isnull()])
-    yield '{} NaN values'.format(nan_count)
+    yield '{} NaN values'.format(
+        format_count(nan_count, len(series), population))
 
 
-@registry.register(name='Count Zeroes', tags='basic')
-def count_zeroes(series):
-    zero_count = len(series[series == 0])
-    yield '{} values are 0'.format(zero_count)
+@registry.register_grouped(count_nan)
+def count_nan_grouped(series, groups):
+    counts = np.bincount(groups, weights=series.isnull().values)
+    for code in np.unique(groups):
+        yield code, '{} NaN values'.format(int(counts[code]))
 
 
-@registry.register(name='Detect suspicious values', tags='basic')
-def detect_suspicious_values(series):
-    suspicious = [65535, 2147483647, 4294967295]
-    for number in suspicious:
-        count = len(series[series == number])
+@registry.register(name='Count Zeroes', tags='basic', sampling='scale')
+def count_zeroes(series, population=None):
+    if is_dictionary_encodable(series):
+        codes, uniques = factorize(series)
+        counts = count_codes(codes, len(uniques))
+        zero_count = counts[np.asarray(uniques == 0)].sum()
+    else:
+        zero_count = len(series[series == 0])
+    yield '{} values are 0'.format(
+        format_count(zero_count, len(series), population))
+
+
+@registry.register_grouped(count_zeroes)
+def count_zeroes_grouped(series, groups):
+    counts = np.bincount(groups, weights=(series == 0).values)
+    for code in np.unique(groups):
+        yield code, '{} values are 0'.format(int(counts[code]))
+
+
+SUSPICIOUS_VALUES = [65535, 2147483647, 4294967295]
+
+
+@registry.register(name='Detect suspicious values', tags='basic',
+                   sampling='scale')
+def detect_suspicious_values(series, population=None):
+    if is_dictionary_encodable(series):
+        codes, uniques = factorize(series)
+        counts = count_codes(codes, len(uniques))
+        get_count = lambda number: counts[np.asarray(uniques == number)].sum()
+    else:
+        get_count = lambda number: len(series[series == number])
+    for number in SUSPICIOUS_VALUES:
+        count = get_count(number)
         if count > 0:
-            yield 'Suspicious number {} appears {} times'.format(number, count)
+            yield 'Suspicious number {} appears {} times'.format(
+                number, format_count(count, len(series), population))
 
 
-@registry.register(name='Detect repeated digits', tags='basic')
-def detect_repdigits(series, digit_count=6):
+@registry.register_grouped(detect_suspicious_values)
+def detect_suspicious_values_grouped(series, groups):
+    findings = []
+    for number in SUSPICIOUS_VALUES:
+        counts = np.bincount(groups, weights=(series == number).values)
+        for code in np.flatnonzero(counts):
+            findings.append((code, 'Suspicious number {} appears {} times'.format(
+                number, int(counts[code]))))
+    findings.sort(key=lambda x: x[0])
+    for finding in findings:
+        yield finding
+
+
+def get_repdigits(digit_count):
     digits = range(1, 10)
     repdigits = [d * (10 ** n - 1) / 9 for d in digits for n in range(2, digit_count)]
-    repdigits = repdigits + [x * -1 for x in repdigits]
-    for repdigit in repdigits:
+    return repdigits + [x * -1 for x in repdigits]
+
+
+@registry.register(name='Detect repeated digits', tags='basic',
+                   sampling='scale')
+def detect_repdigits(series, digit_count=6, population=None):
+    for repdigit in get_repdigits(digit_count):
         count = (series == repdigit).sum()
         if count > 0:
-            yield 'The value {} appears {} times'.format(repdigit, count)
+            yield 'The value {} appears {} times'.format(
+                repdigit, format_count(count, len(series), population))
+
+
+@registry.register_grouped(detect_repdigits)
+def detect_repdigits_grouped(series, groups, digit_count=6):
+    repdigits = get_repdigits(digit_count)
+    mask = series.isin(repdigits).values
+    if not mask.any():
+        return
+    series, groups = series[mask], groups[mask]
+    findings = []
+    for repdigit in repdigits:
+        counts = np.bincount(groups, weights=(series == repdigit).values)
+        for code in np.flatnonzero(counts):
+            findings.append((code, 'The value {} appears {} times'.format(
+                repdigit, int(counts[code]))))
+    findings.sort(key=lambda x: x[0])
+    for finding in findings:
+        yield finding
 
 
-@registry.register(name='Susipicous dataframe length', tags='basic', dataframe=True)
+@registry.register(name='Susipicous dataframe length', tags='basic', dataframe=True,
+                   sampling='full')
 def suspicious_dataset_length(df, threshold=5):
     suspicious = [65535, 1048576]
     df_len = len(df)
     for number in suspicious:
-        if df_len > number - threshold and df_len < number - threshold:
+        if number - threshold < df_len < number + threshold:
             yield 'Dataframe length is suspicious: {}'.format(df_len)
 
 
-@registry.register(name='Duplicate rows', tags='basic', dataframe=True)
+@registry.register_grouped(suspicious_dataset_length)
+def suspicious_dataset_length_grouped(df, groups, threshold=5):
+    suspicious = [65535, 1048576]
+    lengths = np.bincount(groups)
+    for code, df_len in enumerate(lengths):
+        for number in suspicious:
+            if number - threshold < df_len < number + threshold:
+                yield code, 'Dataframe length is suspicious: {}'.format(df_len)
+
+
+@registry.register(name='Duplicate rows', tags='basic', dataframe=True,
+                   footprint=3)
 def duplicate_rows(df):
     duplicates = df[df.duplicated(keep=False)]
     first_duplicates = duplicates[~duplicates.duplicated()]
     for i, dup in first_duplicates.iterrows():
+        check_deadline()
         if dup.isnull().all():
             # Don't deal with full NaN rows
             continue
@@ -70,17 +159,128 @@ def duplicate_rows(df):
         yield message('{} duplicates for the following row'.format(count), rows=dup.to_frame().T.index)
 
 
+def get_column_fingerprint(series, weights):
+    """Position dependent hash of all values of a column"""
+    hashes = pd.util.hash_pandas_object(series, index=False).values
+    return int((hashes * weights).sum())
+
+
+def get_moments_fingerprint(series, weights, decimals=6):
+    """Fingerprint that is the same for columns that are linear transforms
+
+    Standardized moments do not change under scaling and offsets, only the
+    sign of the skew flips for negative factors.
+    """
+    nulls = series.isnull().values
+    values = series[~nulls]
+    if len(values) < 4 or not values.std() > 0:
+        return None
+    return (int(weights[nulls].sum()), round(abs(values.skew()), decimals),
+            round(values.kurt(), decimals))
+
+
+def get_linear_relation(a, b):
+    """Returns (factor, offset) if b == factor * a + offset, else None"""
+    nulls = a.isnull().values
+    if not (nulls == b.isnull().values).all():
+        return None
+    x = a.values[~nulls].astype(float)
+    y = b.values[~nulls].astype(float)
+    x_centered = x - x.mean()
+    factor = y.std() / x.std()
+    if np.dot(x_centered, y - y.mean()) < 0:
+        factor = -factor
+    offset = y.mean() - factor * x.mean()
+    if abs(offset) < 1e-9 * np.abs(y).max():
+        # Rounding noise of the mean
+        offset = 0.0
+    if np.allclose(y, factor * x + offset):
+        return factor, offset
+    return None
+
+
+def find_matches(buckets, key, column, is_match):
+    """Returns the first earlier column of the bucket that matches column"""
+    bucket = buckets.setdefault(key, [])
+    for other in bucket:
+        match = is_match(other, column)
+        if match:
+            return other, match
+    bucket.append(column)
+    return None, None
+
+
+@registry.register(name='Duplicate columns', tags='basic', dataframe=True,
+                   footprint=2)
+def duplicate_columns(df):
+    # Only columns that share a fingerprint are compared value by value
+    weights = np.random.RandomState(0).randint(
+        0, 2 ** 63, size=len(df), dtype=np.int64).astype(np.uint64)
+    exact_buckets = {}
+    derived_buckets = {}
+    for column in df.columns:
+        check_deadline()
+        series = df[column]
+        other, _ = find_matches(
+            exact_buckets, get_column_fingerprint(series, weights), column,
+            lambda a, b: df[a].equals(df[b]))
+        if other is not None:
+            yield 'Column {} is a duplicate of column {}'.format(column, other)
+            continue
+        if not is_numeric(series):
+            continue
+        key = get_moments_fingerprint(series, weights)
+        if key is None:
+            continue
+        other, relation = find_matches(
+            derived_buckets, key, column,
+            lambda a, b: get_linear_relation(df[a], df[b]))
+        if other is None:
+            continue
+        factor, offset = relation
+        if np.isclose(factor, 1) and np.isclose(offset, 0):
+            yield 'Column {} has the same values as column {}'.format(
+                column, other)
+        else:
+            yield 'Column {} is derived from column {}: {} = {:.6g} * {} + {:.6g}'.format(
+                column, other, column, factor, other, offset)
+
+
 @registry.register(name='Duplicate values', tags='basic')
 def duplicate_values(series):
-    duplicates = series[series.duplicated(keep=False)]
-    first_duplicates = duplicates[~duplicates.duplicated()]
-    for dup in first_duplicates:
-        if pd.isnull(dup):
-            # Don't deal with full values here
-            continue
-        count = (duplicates == dup).sum() - 1
+    # Count per distinct value instead of comparing every value
+    codes, uniques = factorize(series)
+    counts = count_codes(codes, len(uniques))
+    first_occurrences = pd.Series(codes).drop_duplicates()
+    first_occurrences = first_occurrences[first_occurrences >= 0]
+    first_positions = np.empty(len(uniques), dtype=np.int64)
+    first_positions[first_occurrences.values] = first_occurrences.index
+    duplicated = np.flatnonzero(counts > 1)
+    for code in duplicated[np.argsort(first_positions[duplicated])]:
         yield message('{} duplicates for the value {}'.format(
-                count, dup), rows=[(duplicates == dup).index[0]])
+                counts[code] - 1, uniques[code]),
+            rows=[series.index[first_positions[code]]])
+
+
+@registry.register_grouped(duplicate_values)
+def duplicate_values_grouped(series, groups):
+    # Group on integer codes, grouping on categoricals would build every
+    # group and category pair
+    codes, uniques = factorize(series)
+    frame = pd.DataFrame({
+        'group': groups,
+        'value': codes,
+        'position': np.arange(len(series))
+    })
+    frame = frame[frame['value'] >= 0]
+    counts = frame.groupby(['group', 'value'], sort=False)['position'].agg(
+        ['size', 'first'])
+    counts = counts[counts['size'] > 1].sort_values('first', kind='mergesort')
+    counts = counts.sort_index(level='group', kind='mergesort', sort_remaining=False)
+    for (code, value), row in counts.iterrows():
+        yield code, message('{} duplicates for the value {}'.format(
+                row['size'] - 1, uniques[value]),
+            rows=[series.index[row['first']]])
 
 BAD_NUM_RE = re.compile('^[\d\., ]+$')
 
@@ -89,10 +289,33 @@ BAD_NUM_RE = re.compile('^[\d\., ]+$')
 def possibly_numeric(series):
     if is_numeric(series):
         return
-    non_na_series = series.dropna()
-    total_values = len(non_na_series)
-    count_numeric_values = non_na_series.str.match(BAD_NUM_RE).sum()
+    # Match every distinct value only once
+    codes, uniques = factorize(series)
+    counts = count_codes(codes, len(uniques))
+    total_values = counts.sum()
+    if not total_values:
+        return
+    matches = pd.Series(uniques, dtype=object).str.match(BAD_NUM_RE)
+    matches = matches.fillna(False).values
+    count_numeric_values = counts[matches.astype(bool)].sum()
     yield '{} out of {} ({}%) of non-null values appear numeric'.format(
         count_numeric_values, total_values,
         round(count_numeric_values / float(total_values) * 100)
     )
+
+
+@registry.register_grouped(possibly_numeric)
+def possibly_numeric_grouped(series, groups):
+    if is_numeric(series):
+        return
+    not_null = series.notnull().values
+    series, groups = series[not_null], groups[not_null]
+    totals = np.bincount(groups)
+    numeric = np.bincount(
+        groups, weights=series.str.match(BAD_NUM_RE).fillna(False).values,
+        minlength=len(totals))
+    for code in np.flatnonzero(totals):
+        yield code, '{} out of {} ({}%) of non-null values appear numeric'.format(
+            int(numeric[code]), totals[code],
+            round(numeric[code] / float(totals[code]) * 100)
+        )
@@ -6,7 +6,7 @@ https://en.wikipedia.org/wiki/Nelson_rules
 import math
 
 from ..diligent import registry
-from ..utils import is_numeric
+from ..utils import is_numeric, format_count
 
 __all__ = ['benfords_law']
 
@@ -17,16 +17,20 @@ def get_most_signifcant_digit(x):
     return int(x * (10 ** -e))
 
 
-@registry.register(name="Benford's law", tags='benford')
-def benfords_law(series):
+@registry.register(name="Benford's law", tags='benford', sampling='scale')
+def benfords_law(series, population=None):
     if not is_numeric(series):
         return
 
     actual = series[series != 0].dropna().apply(get_most_signifcant_digit).value_counts()
 
     total = actual.sum()
+    if population is not None:
+        total = total * population / float(len(series))
     # expected number of each leading digit per Benford's law
     expected = [total * math.log10(1 + 1.0 / i) for i in range(1, 10)]
 
     for i, x in actual.iteritems():
-        yield 'Digit {} appeared {}, expected {}'.format(i, x, round(expected[(i - 1)]))
+        yield 'Digit {} appeared {}, expected {}'.format(
+            i, format_count(x, len(series), population),
+            round(expected[(i - 1)]))
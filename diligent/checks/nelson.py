@@ -6,14 +6,41 @@ https://en.wikipedia.org/wiki/Nelson_rules
 from collections import deque
 
 import numpy as np
+import pandas as pd
 
 from ..diligent import registry
-from ..utils import is_numeric
+from ..utils import (is_numeric, sort_by_group, get_runs, get_group_positions,
+                     check_deadline)
 
-__all__ = ['nelson_rule_%d' % i for i in range(1, 9)]
+__all__ = ['nelson_rule_%d' % i for i in range(1, 9)] + ['NelsonMonitor']
 
 
-@registry.register(name='Nelson Rule 1', tags='nelson')
+def prepare_grouped(series, groups, mean=None, std=None):
+    """Sorts series by group and broadcasts the group mean and std"""
+    series, groups = sort_by_group(series, groups)
+    grouped = series.groupby(groups, sort=False)
+    if mean is None:
+        mean = grouped.transform('mean').values
+    if std is None:
+        std = grouped.transform('std').values
+    return series, groups, mean, std
+
+
+def get_trends(values, groups):
+    """Returns the sign of the change to the previous value in the group"""
+    trends = np.zeros(len(values))
+    if len(values) > 1:
+        trends[1:] = np.sign(values[1:] - values[:-1])
+        trends[1:][groups[1:] != groups[:-1]] = 0
+    return np.nan_to_num(trends)
+
+
+def sort_findings(findings):
+    findings.sort(key=lambda x: x[:-1])
+    return [(finding[0], finding[-1]) for finding in findings]
+
+
+@registry.register(name='Nelson Rule 1', tags='nelson', sampling='block')
 def nelson_rule_1(series, std_mult=3, mean=None, std=None):
     if not is_numeric(series):
         return
@@ -33,7 +60,31 @@ def nelson_rule_1(series, std_mult=3, mean=None, std=None):
         yield message_dec.format(i, x, mean)
 
 
-@registry.register(name='Nelson Rule 2', tags='nelson')
+@registry.register_grouped(nelson_rule_1)
+def nelson_rule_1_grouped(series, groups, std_mult=3, mean=None, std=None):
+    if not is_numeric(series):
+        return
+
+    message_inc = 'At {}: {} is three standard deviations above the mean of {}'
+    message_dec = 'At {}: {} is three standard deviations below the mean of {}'
+
+    series, groups, mean, std = prepare_grouped(series, groups, mean, std)
+    values = series.values
+    mean = np.broadcast_to(mean, values.shape)
+    three_std = std_mult * std
+
+    findings = []
+    for pos in np.flatnonzero(values >= mean + three_std):
+        findings.append((groups[pos], 0, message_inc.format(
+            series.index[pos], values[pos], mean[pos])))
+    for pos in np.flatnonzero(values <= mean - three_std):
+        findings.append((groups[pos], 1, message_dec.format(
+            series.index[pos], values[pos], mean[pos])))
+    for finding in sort_findings(findings):
+        yield finding
+
+
+@registry.register(name='Nelson Rule 2', tags='nelson', sampling='block')
 def nelson_rule_2(series, threshold=9, mean=None):
     if not is_numeric(series):
         return
@@ -47,6 +98,7 @@ def nelson_rule_2(series, threshold=9, mean=None):
     first_trend = None
     below_counter = 0
     for i, x in series.iteritems():
+        check_deadline()
         if x > mean:
             if below_counter >= threshold:
                 yield message_below.format(
@@ -65,6 +117,12 @@ def nelson_rule_2(series, threshold=9, mean=None):
                 first_trend = i
             below_counter += 1
         else:
+            if above_counter >= threshold:
+                yield message_above.format(
+                    first_trend, above_counter, mean)
+            if below_counter >= threshold:
+                yield message_below.format(
+                    first_trend, below_counter, mean)
             below_counter = 0
             above_counter = 0
 
@@ -76,7 +134,28 @@ def nelson_rule_2(series, threshold=9, mean=None):
             first_trend, below_counter, mean)
 
 
-@registry.register(name='Nelson Rule 3', tags='nelson')
+@registry.register_grouped(nelson_rule_2)
+def nelson_rule_2_grouped(series, groups, threshold=9, mean=None):
+    if not is_numeric(series):
+        return
+
+    message_below = 'At {}: {} data points in sequence are below the mean of {}'
+    message_above = 'At {}: {} data points in sequence are above the mean of {}'
+
+    series, groups, mean, _ = prepare_grouped(series, groups, mean, std=0)
+    values = series.values
+    mean = np.broadcast_to(mean, values.shape)
+    side = np.where(values > mean, 1, np.where(values < mean, -1, 0))
+    starts, lengths = get_runs(side, groups)
+    for start, length in zip(starts, lengths):
+        if side[start] == 0 or length < threshold:
+            continue
+        message = message_above if side[start] > 0 else message_below
+        yield groups[start], message.format(
+            series.index[start], length, mean[start])
+
+
+@registry.register(name='Nelson Rule 3', tags='nelson', sampling='block')
 def nelson_rule_3(series, threshold=6):
     if not is_numeric(series):
         return
@@ -91,6 +170,7 @@ def nelson_rule_3(series, threshold=6):
     current_trend = None
 
     for i, x in series.iteritems():
+        check_deadline()
         if last_value is None:
             last_value = x
             last_index = i
@@ -123,7 +203,26 @@ def nelson_rule_3(series, threshold=6):
                 first_row, trend_counter)
 
 
-@registry.register(name='Nelson Rule 4', tags='nelson')
+@registry.register_grouped(nelson_rule_3)
+def nelson_rule_3_grouped(series, groups, threshold=6):
+    if not is_numeric(series):
+        return
+
+    message_inc = 'At {}: {} data points in sequence are increasing'
+    message_dec = 'At {}: {} data points in sequence are decreasing'
+
+    series, groups = sort_by_group(series, groups)
+    trends = get_trends(series.values, groups)
+    starts, lengths = get_runs(trends, groups)
+    for start, length in zip(starts, lengths):
+        # A run of n changes spans n + 1 data points
+        if trends[start] == 0 or length + 1 < threshold:
+            continue
+        message = message_inc if trends[start] > 0 else message_dec
+        yield groups[start], message.format(series.index[start - 1], length + 1)
+
+
+@registry.register(name='Nelson Rule 4', tags='nelson', sampling='block')
 def nelson_rule_4(series, threshold=14):
     if not is_numeric(series):
         return
@@ -137,6 +236,7 @@ def nelson_rule_4(series, threshold=14):
     first_index = None
 
     for i, x in series.iteritems():
+        check_deadline()
         values.append(x)
         indizes.append(i)
         if len(values) < 2:
@@ -144,7 +244,7 @@ def nelson_rule_4(series, threshold=14):
         trend = np.sign(x - values[-2])
 
         # Increasing (1) + decreasing (-1) == 0
-        alternation = current_trend + trend == 0
+        alternation = trend != 0 and current_trend + trend == 0
         if first_index is None and alternation:
             first_index = indizes[0]
             trend_counter = 3  # Trend started two rows before
@@ -163,6 +263,26 @@ def nelson_rule_4(series, threshold=14):
             first_index, trend_counter)
 
 
+@registry.register_grouped(nelson_rule_4)
+def nelson_rule_4_grouped(series, groups, threshold=14):
+    if not is_numeric(series):
+        return
+
+    message = 'At {}: {} data points in sequence alternate in direction'
+
+    series, groups = sort_by_group(series, groups)
+    trends = get_trends(series.values, groups)
+    alternation = np.zeros(len(trends), dtype=bool)
+    # Increasing (1) + decreasing (-1) == 0
+    alternation[1:] = (trends[1:] != 0) & (trends[1:] + trends[:-1] == 0)
+    starts, lengths = get_runs(alternation, groups)
+    for start, length in zip(starts, lengths):
+        # n alternations span n + 2 data points
+        if not alternation[start] or length + 2 < threshold:
+            continue
+        yield groups[start], message.format(series.index[start - 2], length + 2)
+
+
 def nelson_rule_5_6(series, std_mult=2, window=3, threshold=2,
                     mean=None, std=None):
     if not is_numeric(series):
@@ -177,6 +297,7 @@ def nelson_rule_5_6(series, std_mult=2, window=3, threshold=2,
     indizes = deque([], window)
     values = deque([], window)
     for i, x in series.iteritems():
+        check_deadline()
         indizes.append(i)
         values.append(x)
 
@@ -194,18 +315,59 @@ def nelson_rule_5_6(series, std_mult=2, window=3, threshold=2,
                 indizes[0], count_below, window, std_mult)
 
 
-@registry.register(name='Nelson Rule 5', tags='nelson')
+def nelson_rule_5_6_grouped(series, groups, std_mult=2, window=3, threshold=2,
+                            mean=None, std=None):
+    if not is_numeric(series):
+        return
+
+    message = ('At {}: {} out of {} points in a row are more than {} '
+               'standard deviations {} the mean.')
+
+    series, groups, mean, std = prepare_grouped(series, groups, mean, std)
+    values = series.values
+    x_std = std_mult * std
+    positions = get_group_positions(groups)
+    findings = []
+    for order, (direction, flags) in enumerate((
+            ('above', values > mean + x_std),
+            ('below', values < mean - x_std))):
+        cumsum = np.concatenate([[0], np.cumsum(flags)])
+        counts = np.zeros(len(values), dtype=np.int64)
+        counts[window - 1:] = cumsum[window:] - cumsum[:-window]
+        for pos in np.flatnonzero((counts >= threshold) &
+                                  (positions >= window - 1)):
+            start = pos - window + 1
+            findings.append((groups[pos], start, order, message.format(
+                series.index[start], counts[pos], window, std_mult,
+                direction)))
+    for finding in sort_findings(findings):
+        yield finding
+
+
+@registry.register(name='Nelson Rule 5', tags='nelson', sampling='block')
 def nelson_rule_5(series, mean=None, std=None):
     return nelson_rule_5_6(series, std_mult=2, window=3, threshold=2,
                            mean=mean, std=std)
 
 
-@registry.register(name='Nelson Rule 6', tags='nelson')
+@registry.register_grouped(nelson_rule_5)
+def nelson_rule_5_grouped(series, groups, mean=None, std=None):
+    return nelson_rule_5_6_grouped(series, groups, std_mult=2, window=3,
+                                   threshold=2, mean=mean, std=std)
+
+
+@registry.register(name='Nelson Rule 6', tags='nelson', sampling='block')
 def nelson_rule_6(series, mean=None, std=None):
     return nelson_rule_5_6(series, std_mult=1, window=5, threshold=4,
                            mean=mean, std=std)
 
 
+@registry.register_grouped(nelson_rule_6)
+def nelson_rule_6_grouped(series, groups, mean=None, std=None):
+    return nelson_rule_5_6_grouped(series, groups, std_mult=1, window=5,
+                                   threshold=4, mean=mean, std=std)
+
+
 def nelson_rule_7_8(series, std_mult=1, window=15, threshold=15, cmp=None,
                     message=None, mean=None, std=None):
     if not is_numeric(series):
@@ -226,6 +388,7 @@ def nelson_rule_7_8(series, std_mult=1, window=15, threshold=15, cmp=None,
     count = 0
 
     for i, x in series.iteritems():
+        check_deadline()
         indizes.append(i)
         values.append(x)
 
@@ -250,7 +413,22 @@ def nelson_rule_7_8(series, std_mult=1, window=15, threshold=15, cmp=None,
                     first_index, count)
 
 
-@registry.register(name='Nelson Rule 7', tags='nelson')
+def nelson_rule_7_8_grouped(series, groups, std_mult=1, window=15, cmp=None,
+                            message=None, mean=None, std=None):
+    if not is_numeric(series):
+        return
+
+    series, groups, mean, std = prepare_grouped(series, groups, mean, std)
+    values = series.values
+    x_std = std_mult * std
+    flags = cmp(mean - x_std, values, mean + x_std)
+    starts, lengths = get_runs(flags, groups)
+    for start, length in zip(starts, lengths):
+        if flags[start] and length >= window:
+            yield groups[start], message.format(series.index[start], length)
+
+
+@registry.register(name='Nelson Rule 7', tags='nelson', sampling='block')
 def nelson_rule_7(series, mean=None, std=None):
     return nelson_rule_7_8(series, std_mult=1, window=15, threshold=15,
         cmp=lambda b, v, a: b <= v <= a,
@@ -259,7 +437,16 @@ def nelson_rule_7(series, mean=None, std=None):
         mean=mean, std=std)
 
 
-@registry.register(name='Nelson Rule 8', tags='nelson')
+@registry.register_grouped(nelson_rule_7)
+def nelson_rule_7_grouped(series, groups, mean=None, std=None):
+    return nelson_rule_7_8_grouped(series, groups, std_mult=1, window=15,
+        cmp=lambda b, v, a: (b <= v) & (v <= a),
+        message='At {}: {} points in a row are all within 1 standard '
+                'deviation of the mean on either side of the mean.',
+        mean=mean, std=std)
+
+
+@registry.register(name='Nelson Rule 8', tags='nelson', sampling='block')
 def nelson_rule_8(series, mean=None, std=None):
     return nelson_rule_7_8(series, std_mult=1, window=8, threshold=8,
         cmp=lambda b, v, a: v < b or v > a,
@@ -267,3 +454,255 @@ def nelson_rule_8(series, mean=None, std=None):
                 'standard deviation of the mean and the points are in both '
                 'directions from the mean.',
         mean=mean, std=std)
+
+
+@registry.register_grouped(nelson_rule_8)
+def nelson_rule_8_grouped(series, groups, mean=None, std=None):
+    return nelson_rule_7_8_grouped(series, groups, std_mult=1, window=8,
+        cmp=lambda b, v, a: (v < b) | (v > a),
+        message='At {}: {} points in a row exist with none within 1 '
+                'standard deviation of the mean and the points are in both '
+                'directions from the mean.',
+        mean=mean, std=std)
+
+
+class NelsonMonitor(object):
+    """Stateful monitor that applies the Nelson rules to a live stream.
+
+    Points are fed one at a time with ``update`` or as a micro-batch with
+    ``update_many``. Every update costs O(1) per point and returns the
+    messages of all rules that fired for it.
+
+    If ``mean`` and ``std`` are not given, running estimates are used and
+    each point is judged against the estimates of the points before it.
+    Run based rules (2, 3, 4, 7 and 8) fire once, as soon as a run reaches
+    its threshold, instead of once the run has ended.
+    """
+    RULES = tuple(range(1, 9))
+
+    def __init__(self, mean=None, std=None, rules=None):
+        self.fixed_mean = mean
+        self.fixed_std = std
+        self.rules = set(self.RULES if rules is None else rules)
+        # Number of points fed and number of points in the running stats
+        self.position = 0
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+        # Rule 2
+        self.side = 0
+        self.side_counter = 0
+        self.side_first = None
+        # Rule 3
+        self.last_value = None
+        self.last_index = None
+        self.trend = None
+        self.trend_counter = 0
+        self.trend_first = None
+        # Rule 4
+        self.prev_index = None
+        self.last_trend = None
+        self.alternation_counter = 0
+        self.alternation_first = None
+        # Rules 5 - 8
+        self.windows = {
+            5: self._make_window(3),
+            6: self._make_window(5),
+            7: self._make_window(15),
+            8: self._make_window(8),
+        }
+
+    def _make_window(self, size):
+        return {
+            'size': size,
+            'indizes': deque([], size),
+            'flags': deque([], size),
+            'above': 0,
+            'below': 0,
+            'in_run': False,
+        }
+
+    @property
+    def mean(self):
+        if self.fixed_mean is not None:
+            return self.fixed_mean
+        if self.count == 0:
+            return np.nan
+        return self._mean
+
+    @property
+    def std(self):
+        if self.fixed_std is not None:
+            return self.fixed_std
+        if self.count < 2:
+            return np.nan
+        return np.sqrt(self._m2 / (self.count - 1))
+
+    def update_many(self, values):
+        """Feed a micro-batch (``pandas.Series`` or iterable) of points."""
+        if hasattr(values, 'iteritems'):
+            items = values.iteritems()
+        else:
+            items = ((None, x) for x in values)
+        messages = []
+        for i, x in items:
+            messages.extend(self.update(x, index=i))
+        return messages
+
+    def update(self, x, index=None):
+        """Feed a single point and return the messages it triggered.
+
+        Missing points (None or NaN) break all runs and are left out of the running
+        mean and std.
+        """
+        if index is None:
+            index = self.position
+        self.position += 1
+        missing = pd.isnull(x)
+        if missing:
+            # None compares like NaN from here on
+            x = np.nan
+        mean = self.mean
+        std = self.std
+        trend = None
+        if self.last_value is not None and not missing:
+            trend = np.sign(x - self.last_value)
+        messages = []
+
+        if 1 in self.rules:
+            messages.extend(self._rule_1(index, x, mean, std))
+        if 2 in self.rules:
+            messages.extend(self._rule_2(index, x, mean))
+        if 3 in self.rules:
+            messages.extend(self._rule_3(index, trend))
+        if 4 in self.rules:
+            messages.extend(self._rule_4(index, trend))
+        if 5 in self.rules:
+            messages.extend(self._rule_5_6(5, index, x, mean, std, 2, 2))
+        if 6 in self.rules:
+            messages.extend(self._rule_5_6(6, index, x, mean, std, 1, 4))
+        if 7 in self.rules:
+            messages.extend(self._rule_7_8(
+                7, index, mean - std <= x <= mean + std,
+                'At {}: {} points in a row are all within 1 standard '
+                'deviation of the mean on either side of the mean.'))
+        if 8 in self.rules:
+            messages.extend(self._rule_7_8(
+                8, index, x < mean - std or x > mean + std,
+                'At {}: {} points in a row exist with none within 1 '
+                'standard deviation of the mean and the points are in both '
+                'directions from the mean.'))
+
+        self.last_trend = trend
+        self.prev_index = self.last_index
+        self.last_index = index
+        if missing:
+            self.last_value = None
+            self.trend = None
+            self.trend_counter = 0
+            self.alternation_first = None
+            self.alternation_counter = 0
+        else:
+            self.last_value = x
+            self._update_stats(x)
+        return messages
+
+    def _update_stats(self, x):
+        # Welford's online algorithm
+        self.count += 1
+        delta = x - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (x - self._mean)
+
+    def _rule_1(self, i, x, mean, std, std_mult=3):
+        if x >= mean + std_mult * std:
+            yield ('At {}: {} is three standard deviations above '
+                   'the mean of {}'.format(i, x, mean))
+        elif x <= mean - std_mult * std:
+            yield ('At {}: {} is three standard deviations below '
+                   'the mean of {}'.format(i, x, mean))
+
+    def _rule_2(self, i, x, mean, threshold=9):
+        side = 1 if x > mean else -1 if x < mean else 0
+        if side == 0 or side != self.side:
+            self.side_counter = 0
+            self.side_first = i
+        self.side = side
+        if side == 0:
+            return
+        self.side_counter += 1
+        if self.side_counter == threshold:
+            yield 'At {}: {} data points in sequence are {} the mean of {}'.format(
+                self.side_first, threshold,
+                'above' if side > 0 else 'below', mean)
+
+    def _rule_3(self, i, trend, threshold=6):
+        if trend is None:
+            return
+        if trend != self.trend:
+            self.trend_first = self.last_index
+            self.trend_counter = 1  # the first point was in last update
+            self.trend = trend
+        if trend == 0:
+            return
+        self.trend_counter += 1
+        if self.trend_counter == threshold:
+            yield 'At {}: {} data points in sequence are {}'.format(
+                self.trend_first, threshold,
+                'increasing' if trend > 0 else 'decreasing')
+
+    def _rule_4(self, i, trend, threshold=14):
+        if trend is None:
+            return
+        # Increasing (1) + decreasing (-1) == 0
+        if (trend != 0 and self.last_trend is not None and
+                self.last_trend + trend == 0):
+            if self.alternation_first is None:
+                self.alternation_first = self.prev_index
+                self.alternation_counter = 3  # Trend started two points before
+            else:
+                self.alternation_counter += 1
+            if self.alternation_counter == threshold:
+                yield ('At {}: {} data points in sequence alternate '
+                       'in direction'.format(self.alternation_first, threshold))
+        else:
+            self.alternation_first = None
+            self.alternation_counter = 0
+
+    def _push_window(self, window, i, flag):
+        if len(window['flags']) == window['size']:
+            old = window['flags'][0]
+            window['above'] -= old > 0
+            window['below'] -= old < 0
+        window['indizes'].append(i)
+        window['flags'].append(flag)
+        window['above'] += flag > 0
+        window['below'] += flag < 0
+        return len(window['flags']) == window['size']
+
+    def _rule_5_6(self, rule, i, x, mean, std, std_mult, threshold):
+        window = self.windows[rule]
+        x_std = std_mult * std
+        flag = 1 if x > mean + x_std else -1 if x < mean - x_std else 0
+        if not self._push_window(window, i, flag):
+            return
+        message = ('At {}: {} out of {} points in a row are more than {} '
+                   'standard deviations {} the mean.')
+        if window['above'] >= threshold:
+            yield message.format(window['indizes'][0], window['above'],
+                                 window['size'], std_mult, 'above')
+        if window['below'] >= threshold:
+            yield message.format(window['indizes'][0], window['below'],
+                                 window['size'], std_mult, 'below')
+
+    def _rule_7_8(self, rule, i, flag, message):
+        window = self.windows[rule]
+        if not self._push_window(window, i, 1 if flag else 0):
+            return
+        if window['above'] == window['size']:
+            if not window['in_run']:
+                window['in_run'] = True
+                yield message.format(window['indizes'][0], window['size'])
+        else:
+            window['in_run'] = False
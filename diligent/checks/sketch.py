@@ -0,0 +1,56 @@
+"""
+Fixed memory checks for high cardinality columns based on mergeable sketches
+
+"""
+import pandas as pd
+
+from ..diligent import registry
+from ..sketches import HyperLogLog, CountMinSketch, SpaceSaving, hash_values
+from ..utils import check_deadline
+
+__all__ = ['approximate_duplicate_values', 'heavy_hitters']
+
+CHUNKSIZE = 2 ** 16
+
+
+def iter_chunks(series, chunksize=CHUNKSIZE):
+    for start in range(0, len(series), chunksize):
+        check_deadline()
+        chunk = series.iloc[start:start + chunksize].dropna()
+        if len(chunk):
+            yield chunk
+
+
+@registry.register(name='Approximate duplicate values', tags='sketch')
+def approximate_duplicate_values(series, precision=14, chunksize=CHUNKSIZE):
+    sketch = HyperLogLog(precision)
+    total = 0
+    for chunk in iter_chunks(series, chunksize):
+        sketch.update(chunk)
+        total += len(chunk)
+    if not total:
+        return
+    distinct = min(sketch.count(), total)
+    yield 'About {} distinct values, about {}% of {} non-null values are duplicates'.format(
+        distinct, round((1 - distinct / float(total)) * 100, 1), total)
+
+
+@registry.register(name='Heavy hitters', tags='sketch')
+def heavy_hitters(series, k=10, chunksize=CHUNKSIZE):
+    summary = SpaceSaving(k)
+    frequencies = CountMinSketch()
+    for chunk in iter_chunks(series, chunksize):
+        summary.update(chunk)
+        frequencies.update_hashes(hash_values(chunk))
+    top = summary.top()
+    if not top:
+        return
+    values = pd.Series([t[0] for t in top], dtype=series.dtype)
+    estimates = frequencies.estimate(values)
+    for (value, upper, error), estimate in zip(top, estimates):
+        # Both sketches only ever overcount
+        count = min(upper, estimate)
+        if count < 2:
+            continue
+        yield 'The value {} appears about {} times (at least {})'.format(
+            value, count, max(upper - error, 1))
@@ -4,22 +4,32 @@ except NameError:
     pass
 
 from collections import OrderedDict
-from multiprocessing import Pool
+from importlib import import_module
 import itertools
 import inspect
-import uuid
+import time
 
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
+
+import numpy as np
 import pandas as pd
 
-from .utils import escape_js
-from .messages import HTMLMessageRenderer
+from .utils import (escape_js, set_deadline, deadline_passed, CheckTimeout,
+                    get_sample_size, parse_memory_size, measure_memory)
+from .messages import HTMLMessageRenderer, DiligentMessage
+from .arrow import (is_arrow_input, load_arrow, ArrowSource, read_table,
+                    write_table, read_table_metadata, filter_table)
 
 
 def diligent(df, **kwargs):
     """diligent - Proofing a dataframe
 
     Args:
-        df (pandas.DataFrame or pandas.Series): Description
+        df (pandas.DataFrame, pandas.Series, pyarrow.Table or path of an
+            Arrow IPC / Parquet file): Description
         **kwargs (TYPE): Description
 
     Returns:
@@ -28,11 +38,30 @@ def diligent(df, **kwargs):
 
     if isinstance(df, pd.Series):
         df = df.to_frame()
-    columns = df.columns
+    elif is_arrow_input(df):
+        df, kwargs['source'] = load_arrow(df)
     checks = registry.get_checks(
         include=kwargs.pop('include', None),
         exclude=kwargs.pop('exclude', None),
     )
+    groupby = kwargs.pop('groupby', None)
+    if kwargs.pop('approximate', False) and kwargs.get('sample') is None:
+        kwargs['sample'] = DiligentReport.DEFAULT_SAMPLE_SIZE
+    if groupby is not None:
+        if kwargs.get('sample') is not None:
+            raise ValueError('Sampling cannot be combined with groupby')
+        kwargs.pop('source', None)
+        unsupported = sorted(set(kwargs) - {'verbose'})
+        if unsupported:
+            raise TypeError('Options not supported with groupby: {}'.format(
+                ', '.join(unsupported)))
+        return DiligentGroupReport(
+            df,
+            checks,
+            groupby,
+            **kwargs
+        )
+    columns = df.columns
     return DiligentReport(
         df,
         checks,
@@ -41,35 +70,242 @@ def diligent(df, **kwargs):
     )
 
 
-def run_report(args):
-    df, check, col, check_no = args
+TIMEOUT_MESSAGE = 'Timed out after {:.4g} seconds'
+MEMORY_MESSAGE = ('Skipped, needs about {:.0f} MB of memory but the limit '
+                  'is {:.0f} MB')
+
+
+def collect_report(report, timeout=None, deadline=None):
+    """Consumes a check generator within the given time budget
+
+    The budget ends ``timeout`` seconds from now or at the given deadline.
+    On timeout the messages produced so far are returned followed by a
+    timeout message. A check that finishes right after its deadline is not
+    marked as timed out.
+    """
+    if timeout is None:
+        return list(report)
+    messages = []
+    if deadline is None:
+        deadline = time.time() + timeout
+    set_deadline(deadline)
+    try:
+        expired = False
+        for m in report:
+            messages.append(m)
+            if expired:
+                # The check is still producing messages after its deadline
+                raise CheckTimeout()
+            expired = deadline_passed()
+    except CheckTimeout:
+        messages.append(TIMEOUT_MESSAGE.format(timeout))
+    finally:
+        set_deadline(None)
+    return messages
+
+
+SAMPLE_MESSAGE = '{} (in a sample of {} rows)'
+
+
+def start_check(df, check, col, kwargs, sample_size=None):
     if check.dataframe:
-        return (col, check_no), list(check(df))
-    return (col, check_no), list(check(df[col]))
+        if isinstance(df, ArrowSource):
+            df = df.to_pandas()
+        report = check(df, **kwargs)
+    else:
+        report = check(df[col], **kwargs)
+    if sample_size is not None:
+        report = mark_sampled(report, sample_size)
+    return report
+
+
+def mark_sampled(report, sample_size):
+    """Notes on the messages of a check that they refer to a sample"""
+    for m in report:
+        text = SAMPLE_MESSAGE.format(m, sample_size)
+        if isinstance(m, DiligentMessage):
+            yield DiligentMessage(text, rows=m.rows, context=m.context)
+        else:
+            yield text
+
+
+def run_report(args, timeout=None, deadline=None):
+    df, check, col, check_no, kwargs, measure, sample_size = args
+    report = start_check(df, check, col, kwargs, sample_size)
+    if not measure:
+        return ((col, check_no), collect_report(report, timeout, deadline),
+                None)
+    messages, peak = measure_memory(collect_report, report, timeout, deadline)
+    return (col, check_no), messages, peak
 
 
 class DiligentReport(object):
     NUMBER_OF_ITEMS = 5
+    DEFAULT_SAMPLE_SIZE = 100000
+    # Seconds a worker may take past its deadline to return partial results
+    TERMINATE_GRACE = 1.0
 
     def __init__(self, df, checks, columns, verbose=False, interactive=True,
-                 parallel=True):
+                 parallel=True, timeout=None, check_timeout=None,
+                 sample=None, random_state=None, source=None,
+                 memory_limit=None):
         self.df = df
+        # Arrow file the dataframe was loaded from
+        self.source = source
         self.checks = checks
         self.check_order = OrderedDict((c, i) for i, c in enumerate(checks))
         self.columns = list(columns)
+        self.sample = None
+        self.block = None
+        if sample is not None:
+            self.sample, self.block = self.get_samples(
+                df, get_sample_size(sample, len(df)), random_state)
         self.reports = OrderedDict(
             itertools.chain(
-                 (((None, check), check(df)) for check in checks
-                        if check.dataframe),
-                 (((col, check), check(df[col])) for col in columns
+                 (((None, check), self.start_check(check, None))
+                        for check in checks if check.dataframe),
+                 (((col, check), self.start_check(check, col))
+                        for col in columns
                             for check in checks if not check.dataframe),
             )
         )
         self.verbose = verbose
         self.interactive = interactive
         self.parallel = parallel
+        self.timeout = timeout
+        self.check_timeout = check_timeout
+        self.started = None
+        # Memory in bytes that running the checks may use on top of the
+        # dataframe itself
+        self.memory_limit = parse_memory_size(memory_limit)
+        self._memory_usage = {}
+
+    @staticmethod
+    def get_samples(df, size, random_state=None):
+        """Returns a random sample and a contiguous block of rows"""
+        if size >= len(df):
+            return None, None
+        random_state = np.random.RandomState(random_state)
+        start = random_state.randint(0, len(df) - size + 1)
+        return (df.sample(size, random_state=random_state),
+                df.iloc[start:start + size])
+
+    def get_check_args(self, check):
+        """Returns the data a check runs on and its keyword arguments
+
+        In approximate mode checks with ``sampling='scale'`` run on the
+        random sample and scale their counts to the size of the dataframe,
+        checks with ``sampling='block'`` need a sequence and run on a
+        contiguous block of rows, checks with ``sampling='full'`` are cheap
+        and always see the full dataframe. All other checks run on the
+        random sample and their messages say so.
+        """
+        if self.sample is None or check.sampling == 'full':
+            return self.df, {}
+        if check.sampling == 'block':
+            return self.block, {}
+        if check.sampling == 'scale':
+            return self.sample, {'population': len(self.df)}
+        return self.sample, {}
+
+    def get_unscaled_sample_size(self, check):
+        """Returns the sample size to note on messages of a check, if any"""
+        if self.sample is None or check.sampling is not None:
+            return None
+        return len(self.sample)
+
+    def start_check(self, check, col):
+        df, kwargs = self.get_check_args(check)
+        return start_check(df, check, col, kwargs,
+                           self.get_unscaled_sample_size(check))
+
+    def get_caption(self):
+        if self.sample is None:
+            return ''
+        return ('Approximate report on a random sample of {} out of {} rows, '
+                'sequence checks on rows {} to {}'.format(
+                    len(self.sample), len(self.df),
+                    self.block.index[0], self.block.index[-1]))
+
+    def get_data_bytes(self, df, col=None):
+        usage = self._memory_usage.get(id(df))
+        if usage is None:
+            usage = df.memory_usage(index=False, deep=True)
+            self._memory_usage[id(df)] = usage
+        if col is None:
+            return usage.sum()
+        return usage[col]
+
+    def estimate_memory(self, check, col):
+        """Returns the estimated bytes to run a check serially and in a worker
+
+        The working set is a fixed amount plus the size of the input times
+        the footprint of the check. A worker additionally holds its own copy
+        of the input.
+        """
+        df, _ = self.get_check_args(check)
+        data_bytes = self.get_data_bytes(df, None if check.dataframe else col)
+        working_set = check.get_working_set(data_bytes)
+        return working_set, working_set + data_bytes
+
+    def record_footprint(self, check, col, peak):
+        if peak is None:
+            return
+        df, _ = self.get_check_args(check)
+        data_bytes = self.get_data_bytes(df, None if check.dataframe else col)
+        check.record_footprint(data_bytes, peak)
+
+    def get_memory_message(self, estimate):
+        return MEMORY_MESSAGE.format(estimate / 2.0 ** 20,
+                                     self.memory_limit / 2.0 ** 20)
+
+    def plan_tasks(self, tasks):
+        """Splits tasks into pool and serial tasks within the memory limit
+
+        Returns ``(estimate, task)`` tuples for the pool, the tasks to run
+        serially and the number of worker processes.
+        """
+        from multiprocessing import cpu_count
+
+        if self.memory_limit is None:
+            return [(0, task) for task in tasks], [], None
+        pool_tasks = []
+        serial_tasks = []
+        for task in tasks:
+            estimate = self.estimate_memory(task[1], task[2])[1]
+            if estimate <= self.memory_limit:
+                pool_tasks.append((estimate, task))
+            else:
+                serial_tasks.append(task)
+        # As many workers as the smallest tasks allow to run at once
+        processes = 0
+        total = 0
+        for estimate in sorted(e for e, _ in pool_tasks):
+            total += estimate
+            if total > self.memory_limit or processes == cpu_count():
+                break
+            processes += 1
+        if processes < 2:
+            # A single worker only adds a copy of the data, run serially
+            return [], tasks, None
+        return pool_tasks, serial_tasks, processes
+
+    def get_remaining_time(self):
+        if self.timeout is None:
+            return None
+        return max(self.started + self.timeout - time.time(), 0)
+
+    def get_check_timeout(self):
+        remaining = self.get_remaining_time()
+        if remaining is None:
+            return self.check_timeout
+        if self.check_timeout is None:
+            return remaining
+        return min(self.check_timeout, remaining)
 
     def get_reports(self):
+        if self.started is None:
+            self.started = time.time()
         if self.parallel:
             return self.get_reports_parallel()
         return self.get_reports_serial()
@@ -82,17 +318,115 @@ class DiligentReport(object):
     def get_reports_parallel(self):
         for result in self.get_finished_reports():
             yield result
-        pool = Pool()
         tasks = list(self.get_unfinished_reports_args())
-        for key, report in pool.imap_unordered(run_report, tasks):
-            # Store result
-            self.reports[(key[0], self.checks[key[1]])] = report
-            yield key, report
+        if not tasks:
+            return
+        pool_tasks, serial_tasks, processes = self.plan_tasks(tasks)
+        if pool_tasks:
+            for result in self.run_pool(pool_tasks, processes):
+                yield result
+        for task in serial_tasks:
+            yield (task[2], task[3]), self.get_report((task[2], task[1]))
+
+    def run_pool(self, tasks, processes=None):
+        """Runs ``(estimate, task)`` tuples in a pool of worker processes
+
+        Tasks are only started while the estimates of all running tasks fit
+        into the memory limit. Every task gets its own deadline, which the
+        worker enforces itself. Workers still running a task
+        ``TERMINATE_GRACE`` seconds after its deadline are stopped by
+        restarting the pool.
+        """
+        from multiprocessing import Pool, cpu_count
+
+        processes = processes or cpu_count()
+        queued = list(tasks)
+        # Maps keys to (estimate, task, deadline, timeout) of running tasks
+        running = OrderedDict()
+
+        def submit(pool, results):
+            # Only as many tasks as workers, so deadlines start with the task
+            while queued and len(running) < processes and (
+                    self.get_remaining_time() != 0) and (
+                    not running or self.memory_limit is None or
+                    sum(r[0] for r in running.values()) + queued[0][0] <=
+                    self.memory_limit):
+                estimate, task = queued.pop(0)
+                timeout = self.get_check_timeout()
+                deadline = None
+                if timeout is not None:
+                    deadline = time.time() + timeout
+                running[(task[2], task[3])] = (estimate, task, deadline,
+                                               timeout)
+                pool.apply_async(run_report, (task, timeout, deadline),
+                                 callback=results.put,
+                                 error_callback=results.put)
+
+        pool, results = Pool(processes), Queue()
+        try:
+            submit(pool, results)
+            while running:
+                deadlines = [r[2] for r in running.values() if r[2] is not None]
+                wait = None
+                if deadlines:
+                    wait = max(min(deadlines) + self.TERMINATE_GRACE -
+                               time.time(), 0)
+                try:
+                    result = results.get(timeout=wait)
+                except Empty:
+                    now = time.time()
+                    expired = [key for key, r in running.items()
+                               if r[2] is not None and
+                               r[2] + self.TERMINATE_GRACE <= now]
+                    if not expired:
+                        continue
+                    if self.get_remaining_time() == 0:
+                        break
+                    for key in expired:
+                        report = [TIMEOUT_MESSAGE.format(running.pop(key)[3])]
+                        self.reports[(key[0], self.checks[key[1]])] = report
+                        yield key, report
+                    # The workers ignore their deadlines and cannot be
+                    # interrupted, so the pool is replaced and the other
+                    # running tasks start over
+                    pool.terminate()
+                    pool, results = Pool(processes), Queue()
+                    queued[:0] = [r[:2] for r in running.values()]
+                    running.clear()
+                    submit(pool, results)
+                    continue
+                if isinstance(result, Exception):
+                    raise result
+                key, report, peak = result
+                del running[key]
+                submit(pool, results)
+                check = self.checks[key[1]]
+                self.record_footprint(check, key[0], peak)
+                # Store result
+                self.reports[(key[0], check)] = report
+                yield key, report
+            # Report is over its time budget, give up on remaining tasks
+            pending = list(running) + [(t[2], t[3]) for _, t in queued]
+            for key in pending:
+                report = [TIMEOUT_MESSAGE.format(self.timeout)]
+                self.reports[(key[0], self.checks[key[1]])] = report
+                yield key, report
+        finally:
+            pool.terminate()
 
     def get_unfinished_reports_args(self):
         for col, check in self.reports.keys():
             if inspect.isgenerator(self.reports[(col, check)]):
-                yield self.df, check, col, self.check_order[check]
+                df, kwargs = self.get_check_args(check)
+                if df is self.df and self.source is not None:
+                    # Workers map the file instead of unpickling the data
+                    df = self.source
+                elif not check.dataframe:
+                    # Only send the column the check needs
+                    df = df[[col]]
+                yield (df, check, col, self.check_order[check], kwargs,
+                       self.memory_limit is not None,
+                       self.get_unscaled_sample_size(check))
 
     def get_finished_reports(self):
         for key in self.reports:
@@ -102,9 +436,62 @@ class DiligentReport(object):
     def get_report(self, key):
         if inspect.isgenerator(self.reports[key]):
             # Store generator result
-            self.reports[key] = list(self.reports[key])
+            timeout = self.get_check_timeout()
+            if timeout == 0:
+                self.reports[key] = [TIMEOUT_MESSAGE.format(self.timeout)]
+            elif self.memory_limit is None:
+                self.reports[key] = collect_report(self.reports[key], timeout)
+            else:
+                self.reports[key] = self.collect_report_in_memory_limit(
+                    key, timeout)
         return self.reports[key]
 
+    def collect_report_in_memory_limit(self, key, timeout):
+        col, check = key
+        estimate = self.estimate_memory(check, col)[0]
+        if estimate > self.memory_limit:
+            return [self.get_memory_message(estimate)]
+        messages, peak = measure_memory(collect_report, self.reports[key],
+                                        timeout)
+        self.record_footprint(check, col, peak)
+        return messages
+
+    def get_findings(self):
+        """Returns all messages as a dataframe, running unfinished checks"""
+        reports = OrderedDict(self.get_reports())
+        column_numbers = dict((c, i) for i, c in
+                              enumerate(self.get_internal_columns()))
+        records = []
+        for col, check in self.reports:
+            check_no = self.check_order[check]
+            for position, m in enumerate(reports[(col, check_no)]):
+                context = None
+                if isinstance(m, DiligentMessage) and (
+                        m.rows is not None or m.context is not None):
+                    # Only the rows needed to render the message
+                    context = m.get_context(self.df)
+                records.append((column_numbers[col] - 1, check_no, position,
+                                str(m), context))
+        return pd.DataFrame(records, columns=[
+            'column_no', 'check_no', 'position', 'message', 'context'])
+
+    def save(self, path):
+        """Saves the results to a memory mappable Arrow IPC file
+
+        Reload them with ``load_report`` without the source data.
+        """
+        write_table(self.get_findings(), path, metadata={
+            # Messages refer to columns by position, labels like timestamps
+            # or tuples are only kept by their display name
+            'columns': [str(c) for c in self.columns],
+            'checks': [{
+                'name': str(check),
+                'tags': list(check.tags),
+                'dataframe': check.dataframe
+            } for check in self.checks],
+            'caption': self.get_caption(),
+        })
+
     def get_report_columns(self):
         return ['Check', 'Dataframe'] + self.columns
 
@@ -113,10 +500,14 @@ class DiligentReport(object):
 
     def html_generator(self):
         reports = OrderedDict(self.get_reports())
-        yield '<table><thead><tr>'
+        yield '<table>'
+        caption = self.get_caption()
+        if caption:
+            yield '<caption>%s</caption>' % caption
+        yield '<thead><tr>'
         for col in self.get_report_columns():
             yield '<th>'
-            yield col
+            yield str(col)
             yield '</th>'
         yield '</tr></thead><tbody>'
         for check_no, check in enumerate(self.checks):
@@ -153,10 +544,14 @@ class DiligentReport(object):
         return HTMLMessageRenderer(message).render(self.df, column=column)
 
     def empty_table_generator(self, uid):
-        yield '<table><thead><tr>'
+        yield '<table>'
+        caption = self.get_caption()
+        if caption:
+            yield '<caption>%s</caption>' % caption
+        yield '<thead><tr>'
         for col in self.get_report_columns():
             yield '<th>'
-            yield col
+            yield str(col)
             yield '</th>'
         yield '</tr></thead><tbody>'
         for check_no, check in enumerate(self.checks):
@@ -181,6 +576,7 @@ class DiligentReport(object):
 
     def interactive_html(self):
         from IPython.display import display, HTML
+        import uuid
         uid = str(uuid.uuid4())
 
         display(HTML(''.join(self.empty_table_generator(uid))))
@@ -206,12 +602,185 @@ class DiligentReport(object):
         return ''
 
 
+def load_report(path, include=None, exclude=None, columns=None, **kwargs):
+    """Loads a report saved with ``DiligentReport.save``
+
+    Checks can be filtered by tags like in ``diligent`` and by columns,
+    given by their original labels or display names. The loaded report has
+    the display names as columns.
+    """
+    table = read_table(path)
+    metadata = read_table_metadata(table)
+    include = get_tag_list(include)
+    exclude = get_tag_list(exclude)
+    checks = [StoredCheck(**check) for check in metadata['checks']]
+    check_numbers = [i for i, check in enumerate(checks)
+                     if registry.filter_check(check, include, exclude)]
+    all_columns = metadata['columns']
+    if columns is None:
+        columns = all_columns
+    elif not isinstance(columns, list):
+        columns = [columns]
+    columns = [str(c) for c in columns]
+    column_numbers = [-1] + [all_columns.index(c) for c in columns]
+    table = filter_table(table, check_no=check_numbers,
+                         column_no=column_numbers)
+    return StoredReport(
+        [checks[i] for i in check_numbers],
+        columns,
+        dict(zip(check_numbers, [checks[i] for i in check_numbers])),
+        all_columns,
+        table,
+        caption=metadata['caption'],
+        **kwargs
+    )
+
+
+class StoredCheck(object):
+    """Check of a stored report, only knows its metadata"""
+    def __init__(self, name, tags, dataframe):
+        self.name = name
+        self.tags = tags
+        self.dataframe = dataframe
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return str(self)
+
+
+class StoredReport(DiligentReport):
+    """Report loaded with ``load_report`` that renders without a dataframe"""
+    def __init__(self, checks, columns, stored_checks, stored_columns, table,
+                 caption='', verbose=False, interactive=False):
+        self.df = None
+        self.source = None
+        self.checks = checks
+        self.check_order = OrderedDict((c, i) for i, c in enumerate(checks))
+        self.columns = list(columns)
+        self.caption = caption
+        self.verbose = verbose
+        self.interactive = interactive
+        self.parallel = False
+        self.timeout = None
+        self.check_timeout = None
+        self.memory_limit = None
+        self.started = None
+
+        self.reports = OrderedDict(itertools.chain(
+            (((None, check), []) for check in checks if check.dataframe),
+            (((col, check), []) for col in columns
+                for check in checks if not check.dataframe),
+        ))
+        # Stored check and column numbers refer to the saved report
+        internal_columns = [None] + list(stored_columns)
+        for column_no, check_no, context, m in zip(
+                table['column_no'].to_pylist(), table['check_no'].to_pylist(),
+                table['context'].to_pylist(), table['message'].to_pylist()):
+            key = (internal_columns[column_no + 1], stored_checks[check_no])
+            if context is not None:
+                m = DiligentMessage(m, context=context)
+            self.reports[key].append(m)
+
+    def get_caption(self):
+        return self.caption
+
+
+class DiligentGroupReport(object):
+    """Runs checks per group of a dataframe
+
+    Checks that provide a grouped implementation (see
+    ``DiligentRegistry.register_grouped``) are evaluated on the whole column
+    at once, all other checks are run group by group.
+    """
+    def __init__(self, df, checks, groupby, verbose=False):
+        if not isinstance(groupby, (list, tuple)):
+            groupby = [groupby]
+        grouper = df.groupby(groupby, sort=True)
+        groups = grouper.ngroup().fillna(-1).values.astype(np.int64)
+        mask = groups >= 0
+        self.df = df[mask]
+        self.groups = groups[mask]
+        self.group_labels = list(grouper.size().index)
+        self.checks = checks
+        self.columns = [c for c in df.columns if c not in groupby]
+        self.verbose = verbose
+        self._findings = None
+
+    def run_check(self, check, column):
+        if column is None:
+            data = self.df[self.columns]
+        else:
+            data = self.df[column]
+        if check.grouped is not None:
+            return check.grouped(data, self.groups)
+        return self.run_check_per_group(check, data)
+
+    def run_check_per_group(self, check, data):
+        for code, group in data.groupby(self.groups, sort=True):
+            for m in check(group):
+                yield code, m
+
+    def get_findings(self):
+        """Returns a dataframe with one row per message"""
+        if self._findings is not None:
+            return self._findings
+        records = []
+        for check in self.checks:
+            if check.dataframe:
+                columns = [None]
+            else:
+                columns = self.columns
+            for column in columns:
+                for code, m in self.run_check(check, column):
+                    records.append(
+                        (self.group_labels[code], column, str(check), m))
+        self._findings = pd.DataFrame(
+            records, columns=['group', 'column', 'check', 'message'])
+        return self._findings
+
+    def to_frame(self):
+        """Returns a group x (column, check) table of findings"""
+        findings = self.get_findings().copy()
+        findings['column'] = findings['column'].fillna('Dataframe')
+        findings['message'] = findings['message'].map(str)
+        if not self.verbose:
+            findings = findings.groupby(
+                ['group', 'column', 'check'], sort=False
+            ).head(DiligentReport.NUMBER_OF_ITEMS)
+        table = findings.pivot_table(
+            index='group', columns=['column', 'check'], values='message',
+            aggfunc='\n'.join, fill_value=''
+        )
+        # Keep the order of columns and checks instead of sorting them
+        order = findings[['column', 'check']].drop_duplicates()
+        return table.reindex(
+            columns=pd.MultiIndex.from_frame(order), fill_value='')
+
+    def to_html(self):
+        return self.to_frame().to_html()
+
+    _repr_html_ = to_html
+
+
 class DiligentCheck(object):
+    # A check allocates about FIXED_BYTES plus its footprint times the size
+    # of its input
+    DEFAULT_FOOTPRINT = 1.0
+    FIXED_BYTES = 2 ** 20
+    # Measurements on smaller inputs are dominated by fixed allocations
+    MIN_MEASURED_BYTES = 2 ** 20
+
     def __init__(self, func, *args, **kwargs):
         self.func = func
         self.args = args
         self.kwargs = kwargs
         self.dataframe = kwargs.pop('dataframe', False)
+        self.sampling = kwargs.pop('sampling', None)
+        self.grouped = None
+        self.footprint = kwargs.pop('footprint', self.DEFAULT_FOOTPRINT)
+        self.observed_footprint = None
         self.tags = kwargs.pop('tags', [])
         if not isinstance(self.tags, (list, tuple)):
             self.tags = [self.tags]
@@ -227,35 +796,138 @@ class DiligentCheck(object):
     def __call__(self, *args, **kwargs):
         return self.func(*args, **kwargs)
 
+    def get_footprint(self):
+        if self.observed_footprint is not None:
+            return self.observed_footprint
+        return self.footprint
+
+    def get_working_set(self, data_bytes):
+        return self.FIXED_BYTES + data_bytes * self.get_footprint()
+
+    def record_footprint(self, data_bytes, peak):
+        """Updates the footprint from the peak memory measured on an input"""
+        if data_bytes < self.MIN_MEASURED_BYTES:
+            return
+        footprint = max(peak - self.FIXED_BYTES, 0) / float(data_bytes)
+        # Keep the largest footprint seen to stay on the safe side
+        self.observed_footprint = max(self.observed_footprint or 0, footprint)
+
+
+def get_tag_list(tags):
+    if tags is None:
+        return []
+    if isinstance(tags, str):
+        return [t.strip() for t in tags.split(',')]
+    if not isinstance(tags, (list, tuple)):
+        return [tags]
+    return tags
+
+
+def get_entry_points(group):
+    """Returns (name, module) of entry points without importing them"""
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        try:
+            import pkg_resources
+        except ImportError:
+            return []
+        return [(ep.name, ep.module_name)
+                for ep in pkg_resources.iter_entry_points(group)]
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        eps = eps.select(group=group)
+    else:
+        eps = eps.get(group, [])
+    return [(ep.name, ep.value.split(':')[0].strip()) for ep in eps]
+
 
 class DiligentRegistry(object):
+    """Registry of checks
+
+    Checks are provided by plugin modules that register their checks when
+    imported. Plugins are discovered through the ``diligent.checks`` entry
+    point group, the entry point name is the tag of the checks the module
+    provides. A plugin module is only imported when its tag is not
+    excluded and, if tags are included, when it is one of them. Opt-in
+    plugins only run when their tag is included.
+    """
+    ENTRY_POINT_GROUP = 'diligent.checks'
+    BUILTIN_PLUGINS = (
+        ('basic', 'diligent.checks.basic'),
+        ('nelson', 'diligent.checks.nelson'),
+        ('benford', 'diligent.checks.benford'),
+        ('sketch', 'diligent.checks.sketch'),
+    )
+    # Approximations of other checks, not part of the default report
+    OPT_IN_PLUGINS = ('sketch',)
+
     def __init__(self):
         self.checks = OrderedDict()
+        self._plugins = None
+        self.loaded_plugins = set()
+
+    @property
+    def plugins(self):
+        if self._plugins is None:
+            # Builtin plugins are known even when running from a source tree
+            self._plugins = OrderedDict(self.BUILTIN_PLUGINS)
+            for name, module in get_entry_points(self.ENTRY_POINT_GROUP):
+                self._plugins.setdefault(name, module)
+        return self._plugins
+
+    def load_plugins(self, include=None, exclude=None):
+        builtins = OrderedDict(self.BUILTIN_PLUGINS)
+        if include and set(include) <= set(builtins):
+            # Scanning installed distributions for entry points is not free
+            plugins = builtins
+        else:
+            plugins = self.plugins
+        exclude = self.get_excluded_tags(include, exclude)
+        names = [n for n in plugins if n not in exclude]
+        if include and set(include) <= set(plugins):
+            names = [n for n in names if n in include]
+        for name in names:
+            if name not in self.loaded_plugins:
+                self.loaded_plugins.add(name)
+                import_module(plugins[name])
 
     def add_check(self, func, args, kwargs):
         self.checks[func] = DiligentCheck(func, *args, **kwargs)
 
+    def get_check_position(self, check):
+        # Order checks by plugin first so that the order does not depend
+        # on which plugins were loaded first
+        plugins = self._plugins
+        if plugins is None:
+            plugins = OrderedDict(self.BUILTIN_PLUGINS)
+        modules = list(plugins.values())
+        if check.func.__module__ in modules:
+            return modules.index(check.func.__module__)
+        return len(modules)
+
     def __iter__(self):
-        for key in self.checks:
-            yield self.checks[key]
+        for check in self.get_checks():
+            yield check
+
+    def get_sorted_checks(self):
+        return sorted(self.checks.values(), key=self.get_check_position)
 
     def get_checks(self, include=None, exclude=None):
-        if include is None:
-            include = []
-        if exclude is None:
-            exclude = []
-        if isinstance(include, str):
-            include = [i.strip() for i in include.split(',')]
-        if isinstance(exclude, str):
-            exclude = [e.strip() for e in exclude.split(',')]
-        if not isinstance(include, (list, tuple)):
-            include = [include]
-        if not isinstance(exclude, (list, tuple)):
-            exclude = [exclude]
-        return [c for c in self.__iter__() if (
+        include = get_tag_list(include)
+        exclude = self.get_excluded_tags(include, get_tag_list(exclude))
+        self.load_plugins(include, exclude)
+        return [c for c in self.get_sorted_checks() if (
             self.filter_check(c, include, exclude)
         )]
 
+    def get_excluded_tags(self, include, exclude):
+        """Adds the tags of opt-in plugins unless tags are included"""
+        exclude = list(exclude or [])
+        if not include:
+            exclude += [n for n in self.OPT_IN_PLUGINS if n not in exclude]
+        return exclude
+
     def filter_check(self, check, include, exclude):
         tags = set(check.tags)
         return ((not include or set(include) & tags)
@@ -271,4 +943,16 @@ class DiligentRegistry(object):
         else:
             return _register
 
+    def register_grouped(self, func):
+        """Registers a vectorized grouped implementation of a check
+
+        The grouped function receives the series (or dataframe) and an array
+        of integer group codes of the same length and yields
+        ``(group code, message)`` tuples.
+        """
+        def _register(grouped_func):
+            self.checks[func].grouped = grouped_func
+            return grouped_func
+        return _register
+
 registry = DiligentRegistry()
@@ -3,13 +3,20 @@ def message(mes, **kwargs):
 
 
 class DiligentMessage(object):
-    def __init__(self, message, rows=None):
+    def __init__(self, message, rows=None, context=None):
         self.message = message
         self.rows = rows
+        # Rendered rows for messages of stored reports
+        self.context = context
 
     def __str__(self):
         return self.message
 
+    def get_context(self, df):
+        if self.context is not None:
+            return self.context
+        return df.loc[self.rows].to_html()
+
 
 class MessageRenderer(object):
     def __init__(self, message):
@@ -23,8 +30,8 @@ class HTMLMessageRenderer(MessageRenderer):
         return str(self.message)
 
     def to_html(self, df, column=None):
-        if self.message.rows is not None:
+        if self.message.rows is not None or self.message.context is not None:
             return '<h4>{}</h4>{}'.format(
-                self.message, df.ix[self.message.rows].to_html()
+                self.message, self.message.get_context(df)
             )
         return self.message
@@ -0,0 +1,156 @@
+"""
+Mergeable sketches for fixed memory checks on high cardinality columns
+
+All sketches consume data in chunks and can be merged with a sketch of the
+same kind and parameters, e.g. one built on another chunk or in another
+worker.
+
+"""
+import numpy as np
+import pandas as pd
+
+
+def hash_values(values):
+    """Returns 64 bit hashes of the values of a series"""
+    return pd.util.hash_pandas_object(values, index=False).values
+
+
+def count_leading_zeros(x):
+    """Vectorized count of leading zero bits of 64 bit unsigned integers"""
+    x = x.copy()
+    zeros = np.zeros(len(x), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = x < np.uint64(1 << (64 - shift))
+        zeros[mask] += shift
+        x[mask] <<= np.uint64(shift)
+    zeros[x >> np.uint64(63) == 0] += 1
+    return zeros
+
+
+class HyperLogLog(object):
+    """HyperLogLog distinct count estimator
+
+    Uses ``2 ** precision`` one byte registers, the relative standard error
+    is about ``1.04 / sqrt(2 ** precision)``.
+    """
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        self.update_hashes(hash_values(values))
+
+    def update_hashes(self, hashes):
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        rank = count_leading_zeros(hashes << np.uint64(p)) + 1
+        rank = np.minimum(rank, 64 - p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge sketches with different precision')
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype(float))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction
+            estimate = m * np.log(m / float(zeros))
+        return int(round(estimate))
+
+
+class CountMinSketch(object):
+    """Count-Min frequency estimator
+
+    Estimates never undercount and overcount by at most
+    ``e / width * total`` with probability ``1 - exp(-depth)``.
+    """
+    def __init__(self, width=2 ** 16, depth=4, seed=0):
+        if width & (width - 1):
+            raise ValueError('Width needs to be a power of two')
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        self.shift = np.uint64(64 - int(np.log2(width)))
+        random_state = np.random.RandomState(seed)
+        self.multipliers = random_state.randint(
+            0, 2 ** 63, size=depth, dtype=np.int64
+        ).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def get_indizes(self, hashes, row):
+        # Multiply-shift hashing, one multiplier per row
+        return ((hashes * self.multipliers[row]) >> self.shift).astype(np.intp)
+
+    def update(self, values):
+        self.update_hashes(hash_values(values))
+
+    def update_hashes(self, hashes):
+        for row in range(self.depth):
+            self.table[row] += np.bincount(self.get_indizes(hashes, row),
+                                           minlength=self.width)
+
+    def merge(self, other):
+        if (other.width, other.depth, other.seed) != (
+                self.width, self.depth, self.seed):
+            raise ValueError('Cannot merge sketches with different parameters')
+        self.table += other.table
+        return self
+
+    def estimate(self, values):
+        hashes = hash_values(values)
+        return np.min([self.table[row][self.get_indizes(hashes, row)]
+                       for row in range(self.depth)], axis=0)
+
+
+class SpaceSaving(object):
+    """Space-Saving summary of the ``k`` most frequent values
+
+    Every tracked value has an upper bound of its count and a maximum
+    overestimation error. Values that are not tracked appear at most
+    ``missing`` times.
+    """
+    def __init__(self, k=100):
+        self.k = k
+        self.counts = {}
+        self.errors = {}
+        self.missing = 0
+
+    def update(self, values):
+        counts = values.value_counts()
+        summary = SpaceSaving(self.k)
+        top = counts.iloc[:self.k]
+        summary.counts = dict(top.items())
+        summary.errors = dict.fromkeys(summary.counts, 0)
+        if len(counts) > self.k:
+            summary.missing = counts.iloc[self.k]
+        return self.merge(summary)
+
+    def merge(self, other):
+        counts = {}
+        errors = {}
+        for value in set(self.counts) | set(other.counts):
+            counts[value] = (self.counts.get(value, self.missing) +
+                             other.counts.get(value, other.missing))
+            errors[value] = (self.errors.get(value, self.missing) +
+                             other.errors.get(value, other.missing))
+        missing = self.missing + other.missing
+        top = sorted(counts, key=counts.get, reverse=True)
+        if len(top) > self.k:
+            missing = max(missing, counts[top[self.k]])
+            top = top[:self.k]
+        self.counts = dict((value, counts[value]) for value in top)
+        self.errors = dict((value, errors[value]) for value in top)
+        self.missing = missing
+        return self
+
+    def top(self):
+        """Returns (value, upper bound, error) tuples, most frequent first"""
+        return [(value, self.counts[value], self.errors[value])
+                for value in sorted(self.counts, key=self.counts.get,
+                                    reverse=True)]
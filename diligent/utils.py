@@ -1,3 +1,10 @@
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
 
 NUMERICS = set(['int16', 'int32', 'int64', 'float16', 'float32', 'float64'])
 
@@ -6,6 +13,93 @@ def is_numeric(series):
     return str(series.dtype) in NUMERICS
 
 
+def get_sample_size(sample, length):
+    """Returns the number of rows for a sample given as count or fraction"""
+    if isinstance(sample, float) and sample <= 1:
+        # Tiny fractions of short columns still sample one row
+        return max(int(round(sample * length)), min(length, 1))
+    return int(sample)
+
+
+def estimate_count(count, sample_size, population, z=1.96):
+    """Scales a count from a sample to the population
+
+    Returns the estimate and the bounds of its Wilson score interval.
+    """
+    if sample_size == 0:
+        return 0, 0, population
+    scale = population / float(sample_size)
+    p = count / float(sample_size)
+    denominator = 1 + z ** 2 / sample_size
+    center = (p + z ** 2 / (2 * sample_size)) / denominator
+    margin = z * np.sqrt(p * (1 - p) / sample_size +
+                         z ** 2 / (4 * sample_size ** 2)) / denominator
+    return (count * scale, max(center - margin, 0) * population,
+            min(center + margin, 1) * population)
+
+
+def format_count(count, sample_size, population=None):
+    """Formats a count, as an estimate with 95% CI if sampled"""
+    if population is None or population == sample_size:
+        return '{}'.format(count)
+    estimate, low, high = estimate_count(count, sample_size, population)
+    return '~{:.0f} (95% CI {:.0f}-{:.0f})'.format(estimate, low, high)
+
+
+MEMORY_UNITS = {'': 1, 'K': 2 ** 10, 'M': 2 ** 20, 'G': 2 ** 30, 'T': 2 ** 40}
+
+
+def parse_memory_size(size):
+    """Returns bytes for sizes given as number or string like '8GB'"""
+    if size is None or isinstance(size, (int, float)):
+        return size
+    match = re.match(r'^\s*([\d.]+)\s*([KMGT]?)I?B?\s*$', size.upper())
+    if match is None:
+        raise ValueError('Invalid memory size: {}'.format(size))
+    return int(float(match.group(1)) * MEMORY_UNITS[match.group(2)])
+
+
+def measure_memory(func, *args):
+    """Returns the result of func and the peak memory allocated by it"""
+    import tracemalloc
+
+    if tracemalloc.is_tracing():
+        # Don't interfere with somebody else's tracing
+        return func(*args), None
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+class CheckTimeout(Exception):
+    pass
+
+
+_deadline = threading.local()
+
+
+def set_deadline(deadline):
+    _deadline.value = deadline
+
+
+def deadline_passed():
+    deadline = getattr(_deadline, 'value', None)
+    return deadline is not None and time.time() > deadline
+
+
+def check_deadline():
+    """Raises CheckTimeout if the running check is over its time budget
+
+    Checks can call this inside long inner loops that rarely yield.
+    """
+    if deadline_passed():
+        raise CheckTimeout()
+
+
 _js_escapes = {
     ord('\\'): '\\u005C',
     ord('\''): '\\u0027',
@@ -26,3 +120,60 @@ _js_escapes.update((ord('%c' % z), '\\u%04X' % z) for z in range(32))
 
 def escape_js(value):
     return value.translate(_js_escapes)
+
+
+def is_dictionary_encodable(series):
+    """Categorical and object series are worth evaluating per distinct value"""
+    return str(series.dtype) == 'category' or series.dtype == object
+
+
+def factorize(series):
+    """Returns integer codes (-1 for null) and the distinct values
+
+    Categorical series reuse their categories and codes.
+    """
+    if str(series.dtype) == 'category':
+        return series.cat.codes.values, series.cat.categories
+    codes, uniques = pd.factorize(series)
+    return codes, pd.Index(uniques)
+
+
+def count_codes(codes, size):
+    """Returns the number of occurrences of each code"""
+    return np.bincount(codes[codes >= 0], minlength=size)
+
+
+def sort_by_group(series, groups):
+    """Stable sort of series and group codes so that groups are contiguous"""
+    order = np.argsort(groups, kind='mergesort')
+    return series.iloc[order], groups[order]
+
+
+def get_runs(values, groups):
+    """Returns start positions and lengths of runs of equal values
+
+    Runs never cross a change of group code, so ``values`` and ``groups``
+    should be sorted by group (see ``sort_by_group``).
+    """
+    n = len(values)
+    if n == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    change = np.empty(n, dtype=bool)
+    change[0] = True
+    change[1:] = (values[1:] != values[:-1]) | (groups[1:] != groups[:-1])
+    starts = np.flatnonzero(change)
+    lengths = np.diff(np.append(starts, n))
+    return starts, lengths
+
+
+def get_group_positions(groups):
+    """Returns the position of each element within its (contiguous) group"""
+    n = len(groups)
+    positions = np.arange(n)
+    if n == 0:
+        return positions
+    change = np.empty(n, dtype=bool)
+    change[0] = True
+    change[1:] = groups[1:] != groups[:-1]
+    starts = np.maximum.accumulate(np.where(change, positions, 0))
+    return positions - starts
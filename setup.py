@@ -37,6 +37,17 @@ setup(
     install_requires=[
         'pandas',
     ],
+    extras_require={
+        'arrow': ['pyarrow'],
+    },
+    entry_points={
+        'diligent.checks': [
+            'basic = diligent.checks.basic',
+            'nelson = diligent.checks.nelson',
+            'benford = diligent.checks.benford',
+            'sketch = diligent.checks.sketch',
+        ],
+    },
     test_suite="tests",
     include_package_data=True,
     classifiers=[
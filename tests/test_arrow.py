@@ -0,0 +1,97 @@
+import pickle
+
+import pandas as pd
+import pytest
+
+from diligent import diligent, load_report
+from diligent.arrow import ArrowSource
+
+pa = pytest.importorskip('pyarrow')
+feather = pytest.importorskip('pyarrow.feather')
+
+
+def get_messages(reports):
+    return dict((key, [str(m) for m in messages]) for key, messages in reports)
+
+
+def test_arrow_file(tmpdir):
+    df = pd.DataFrame({'a': [0, 1, 2, 0], 'b': [1.5, None, 2.5, 3.5]})
+    path = str(tmpdir.join('data.arrow'))
+    feather.write_feather(df, path, compression='uncompressed')
+
+    source = pickle.loads(pickle.dumps(ArrowSource(path)))
+    # Columns are views on the memory mapped file
+    assert not source['a'].values.flags.writeable
+    assert list(source['a']) == [0, 1, 2, 0]
+
+    report = diligent(path, include='basic', parallel=False)
+    expected = diligent(df, include='basic', parallel=False)
+    assert isinstance(report.source, ArrowSource)
+    assert (get_messages(report.get_reports()) ==
+            get_messages(expected.get_reports()))
+
+
+def test_arrow_table():
+    df = pd.DataFrame({'a': [0, 1, 2, 0]})
+    report = diligent(pa.Table.from_pandas(df), include='basic', parallel=False)
+    assert report.source is None
+    assert list(report.df['a']) == [0, 1, 2, 0]
+
+
+def test_save_and_load_report(tmpdir):
+    df = pd.DataFrame({'a': [1.0, 2.0, 2.0, 0.0], 'b': ['x', 'y', 'y', 'z']})
+    report = diligent(df, include='basic', parallel=False, interactive=False)
+    path = str(tmpdir.join('report.arrow'))
+    report.save(path)
+
+    loaded = load_report(path)
+    assert loaded.df is None
+    assert [str(c) for c in loaded.checks] == [str(c) for c in report.checks]
+    assert loaded.to_html() == report.to_html()
+
+    loaded = load_report(path, exclude='basic')
+    assert loaded.checks == []
+
+    loaded = load_report(path, columns=['b'])
+    assert loaded.columns == ['b']
+    reports = dict((str(key[0]) + str(loaded.checks[key[1]]), messages)
+                   for key, messages in loaded.get_reports())
+    assert [str(m) for m in reports['bDuplicate values']] == [
+        '1 duplicates for the value y']
+    assert '<td>y</td>' in loaded.to_html()
+
+
+@pytest.mark.parametrize('name', ['data.arrow', 'data.parquet'])
+def test_arrow_file_index(tmpdir, name):
+    pytest.importorskip('pyarrow.parquet')
+    df = pd.DataFrame({'a': [0, 1, 1, 0, 2]}, index=[10, 20, 30, 40, 50])
+    path = str(tmpdir.join(name))
+    if name.endswith('.parquet'):
+        df.to_parquet(path)
+    else:
+        feather.write_feather(df, path, compression='uncompressed')
+
+    assert list(ArrowSource(path)['a'].index) == [10, 20, 30, 40, 50]
+    report = diligent(path, include='basic', parallel=True)
+    expected = diligent(df, include='basic', parallel=False)
+    assert (get_messages(report.get_reports()) ==
+            get_messages(expected.get_reports()))
+    assert report.to_html() == expected.to_html()
+
+
+def test_save_and_load_report_labels(tmpdir):
+    day = pd.Timestamp('2020-01-01')
+    df = pd.DataFrame({day: [1, 1, 2], ('x', 1): [0, 1, 0]})
+    report = diligent(df, include='basic', parallel=False, interactive=False)
+    path = str(tmpdir.join('report.arrow'))
+    report.save(path)
+
+    loaded = load_report(path)
+    assert loaded.columns == [str(day), str(('x', 1))]
+    assert loaded.to_html() == report.to_html()
+
+    for columns in ([('x', 1)], [str(('x', 1))]):
+        loaded = load_report(path, columns=columns)
+        assert loaded.columns == [str(('x', 1))]
+        assert 'Count Zeroes' in loaded.to_html()
+        assert '2 values are 0' in loaded.to_html()
@@ -1 +1,94 @@
-# TODO
+import numpy as np
+import pandas as pd
+import pytest
+
+from diligent import diligent
+from diligent.checks.basic import (count_zeroes, detect_suspicious_values,
+                                   duplicate_columns,
+                                   duplicate_values, duplicate_values_grouped,
+                                   possibly_numeric,
+                                   suspicious_dataset_length)
+
+
+def test_grouped_report():
+    df = pd.DataFrame({
+        'sensor': ['a', 'a', 'b', 'b', 'b'],
+        'value': [0, 0, 1, np.nan, 65535],
+    })
+    report = diligent(df, groupby='sensor', include='basic')
+    findings = report.get_findings()
+    messages = findings.groupby(['group', 'check'])['message'].apply(
+        lambda x: [str(m) for m in x])
+    assert messages['a', 'Count Zeroes'] == ['2 values are 0']
+    assert messages['b', 'Count NaN'] == ['1 NaN values']
+    assert messages['b', 'Detect suspicious values'] == [
+        'Suspicious number 65535 appears 1 times']
+    assert messages['a', 'Duplicate values'] == ['1 duplicates for the value 0.0']
+
+    table = report.to_frame()
+    assert list(table.index) == ['a', 'b']
+    assert table.loc['a', ('value', 'Count Zeroes')] == '2 values are 0'
+
+
+def test_grouped_duplicate_values_on_categories():
+    series = pd.Series(pd.Categorical(
+        ['x', 'y', 'x', None, 'y', 'y', 'x'],
+        categories=['x', 'y'] + ['unused %d' % i for i in range(1000)]))
+    groups = np.array([0, 0, 0, 1, 1, 1, 1])
+    messages = [(code, str(m), m.rows)
+                for code, m in duplicate_values_grouped(series, groups)]
+    assert messages == [
+        (0, '1 duplicates for the value x', [0]),
+        (1, '1 duplicates for the value y', [4]),
+    ]
+    for code in (0, 1):
+        expected = [str(m) for m in duplicate_values(series[groups == code])]
+        assert [m for c, m, _ in messages if c == code] == expected
+
+
+def test_value_checks_on_categories():
+    series = pd.Series(['0', 'a', 'a', None, '12', 'a', '12', '1,5'])
+    for values in (series, series.astype('category')):
+        messages = [str(m) for m in duplicate_values(values)]
+        assert messages == ['2 duplicates for the value a',
+                            '1 duplicates for the value 12']
+        assert [m.rows for m in duplicate_values(values)] == [[1], [4]]
+        assert list(possibly_numeric(values)) == [
+            '4 out of 7 (57%) of non-null values appear numeric']
+
+    series = pd.Series([0, 65535, 0, 1, 65535], dtype='category')
+    assert list(count_zeroes(series)) == ['2 values are 0']
+    assert list(detect_suspicious_values(series)) == [
+        'Suspicious number 65535 appears 2 times']
+
+
+def test_duplicate_columns():
+    df = pd.DataFrame({
+        'km': [1.0, 2.5, 3.0, 7.0, 11.0],
+        'name': ['a', 'b', 'c', 'd', 'e'],
+    })
+    df['km_copy'] = df['km']
+    df['miles'] = df['km'] / 1.609344
+    df['offset'] = 10 - df['km']
+    df['name_copy'] = df['name']
+    df['other'] = [3.0, 1.0, 2.0, 5.0, 1.0]
+    assert list(duplicate_columns(df)) == [
+        'Column km_copy is a duplicate of column km',
+        'Column miles is derived from column km: miles = 0.621371 * km + 0',
+        'Column offset is derived from column km: offset = -1 * km + 10',
+        'Column name_copy is a duplicate of column name',
+    ]
+
+
+def test_grouped_report_rejects_unsupported_options():
+    df = pd.DataFrame({'sensor': ['a', 'b'], 'value': [0, 1]})
+    for option in ('parallel', 'timeout', 'check_timeout', 'memory_limit'):
+        with pytest.raises(TypeError, match=option):
+            diligent(df, groupby='sensor', **{option: 1})
+
+
+def test_suspicious_dataset_length():
+    df = pd.DataFrame({'a': np.zeros(65533)})
+    assert list(suspicious_dataset_length(df)) == [
+        'Dataframe length is suspicious: 65533']
+    assert list(suspicious_dataset_length(df.iloc[:65530])) == []
@@ -0,0 +1,213 @@
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from diligent import diligent, check_deadline, registry
+from diligent.diligent import DiligentCheck, DiligentReport
+from diligent.utils import format_count, get_sample_size, parse_memory_size
+
+
+def slow_check(series):
+    yield 'First finding'
+    while True:
+        check_deadline()
+        time.sleep(0.01)
+
+
+def test_check_timeout():
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    report = DiligentReport(df, [DiligentCheck(slow_check)], df.columns,
+                            parallel=False, check_timeout=0.05)
+    reports = dict(report.get_reports())
+    assert reports[('a', 0)] == ['First finding', 'Timed out after 0.05 seconds']
+
+
+def sleeping_check(series):
+    # Does not call check_deadline
+    time.sleep(10)
+    yield 'Done'
+
+
+def finished_check(series):
+    time.sleep(0.2)
+    yield 'Done'
+
+
+def test_check_timeout_without_more_messages():
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    report = DiligentReport(df, [DiligentCheck(finished_check)], df.columns,
+                            parallel=False, check_timeout=0.05)
+    assert dict(report.get_reports())[('a', 0)] == ['Done']
+
+
+def test_check_timeout_parallel():
+    df = pd.DataFrame({'a': [1, 2, 3], 'b': [4, 5, 6]})
+    checks = [DiligentCheck(sleeping_check), DiligentCheck(length_check)]
+    report = DiligentReport(df, checks, df.columns, check_timeout=0.5)
+    started = time.time()
+    reports = dict(report.get_reports())
+    assert time.time() - started < 6
+    assert reports[('a', 0)] == ['Timed out after 0.5 seconds']
+    assert reports[('b', 0)] == ['Timed out after 0.5 seconds']
+    assert reports[('a', 1)] == [3]
+    assert reports[('b', 1)] == [3]
+
+
+def test_check_timeout_parallel_partial_messages():
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    report = DiligentReport(df, [DiligentCheck(slow_check)], df.columns,
+                            check_timeout=0.5)
+    reports = dict(report.get_reports())
+    assert reports[('a', 0)] == ['First finding', 'Timed out after 0.5 seconds']
+
+    # Workers also stop on their own at the end of the report budget
+    report = DiligentReport(df, [DiligentCheck(slow_check)], df.columns,
+                            timeout=0.5)
+    messages = dict(report.get_reports())[('a', 0)]
+    assert messages[0] == 'First finding'
+    assert messages[1].startswith('Timed out after')
+
+
+def test_sampled_report():
+    df = pd.DataFrame({'a': [0, 1] * 500})
+    report = diligent(df, sample=100, random_state=0, include='basic',
+                      parallel=False, interactive=False)
+    assert len(report.sample) == 100
+    assert len(report.block) == 100
+    reports = dict((report.checks[key[1]].func.__name__, messages)
+                   for key, messages in report.get_reports())
+    assert reports['show_data_type'] == ['int64']
+    assert reports['count_zeroes'][0].startswith('~')
+    assert '95% CI' in reports['count_zeroes'][0]
+    # Counts that do not scale are marked as counted in the sample
+    assert all(str(m).endswith('(in a sample of 100 rows)')
+               for m in reports['duplicate_values'])
+    assert reports['duplicate_values'][0].rows is not None
+    assert 'in a sample of 100 rows' in report.to_html()
+
+    report = diligent(df, sample=100, random_state=0, include='basic',
+                      parallel=True)
+    reports = dict((report.checks[key[1]].func.__name__, messages)
+                   for key, messages in report.get_reports())
+    assert all(str(m).endswith('(in a sample of 100 rows)')
+               for m in reports['duplicate_values'])
+
+
+def test_format_count():
+    assert format_count(5, 10) == '5'
+    assert format_count(5, 10, population=10) == '5'
+    assert format_count(50, 100, population=1000) == '~500 (95% CI 404-596)'
+    assert format_count(0, 0, 1000) == '~0 (95% CI 0-1000)'
+
+
+def test_tiny_sample_fraction():
+    assert get_sample_size(0.0001, 1000) == 1
+    assert get_sample_size(0.0001, 0) == 0
+    df = pd.DataFrame({'a': range(1000)})
+    report = diligent(df, sample=0.0001, parallel=False)
+    assert len(report.sample) == 1
+    report.to_html()
+
+
+def test_parse_memory_size():
+    assert parse_memory_size(None) is None
+    assert parse_memory_size(1000) == 1000
+    assert parse_memory_size('2 KB') == 2048
+    assert parse_memory_size('1.5GiB') == 3 * 2 ** 29
+
+
+def length_check(series):
+    yield len(series)
+
+
+def test_memory_limit():
+    df = pd.DataFrame({'a': range(1000)})
+    check = DiligentCheck(length_check, footprint=100)
+    report = DiligentReport(df, [check], df.columns, parallel=False,
+                            memory_limit=1000)
+    reports = dict(report.get_reports())
+    assert reports[('a', 0)] == [
+        'Skipped, needs about 2 MB of memory but the limit is 0 MB']
+
+    report = DiligentReport(df, [check], df.columns, parallel=False,
+                            memory_limit='1GB')
+    reports = dict(report.get_reports())
+    assert reports[('a', 0)] == [1000]
+
+
+def buffer_check(series):
+    # Allocates 2 MB whatever the size of the input
+    yield len(np.ones(2 ** 18))
+
+
+def test_measured_footprint():
+    check = DiligentCheck(buffer_check, footprint=100)
+    small = pd.DataFrame({'a': range(100)})
+    report = DiligentReport(small, [check], small.columns, parallel=False,
+                            memory_limit='1GB')
+    dict(report.get_reports())
+    # Too small to tell the fixed allocations from the per byte ones
+    assert check.get_footprint() == 100
+
+    large = pd.DataFrame({'a': range(2 ** 18)})
+    report = DiligentReport(large, [check], large.columns, parallel=False,
+                            memory_limit='1GB')
+    dict(report.get_reports())
+    # The measured footprint replaces the registered one
+    assert check.get_footprint() < 1
+    dict(DiligentReport(small, [check], small.columns, parallel=False,
+                        memory_limit='1GB').get_reports())
+    assert check.get_footprint() < 1
+
+
+def get_imported_plugins(code):
+    """Runs code in a fresh interpreter, returns the check modules imported"""
+    output = subprocess.check_output([sys.executable, '-c', (
+        'import sys\n'
+        'from diligent import registry\n'
+        '{}\n'
+        'print(sorted(m for m in sys.modules\n'
+        '             if m.startswith("diligent.checks.")))'.format(code))])
+    return output.decode('utf-8').strip()
+
+
+def test_plugins_load_lazily():
+    assert get_imported_plugins(
+        'registry.get_checks(include="nelson")') == "['diligent.checks.nelson']"
+    imported = get_imported_plugins('registry.get_checks(exclude="nelson")')
+    assert 'diligent.checks.basic' in imported
+    assert 'diligent.checks.nelson' not in imported
+
+
+def test_entry_point_plugins(tmpdir, monkeypatch):
+    tmpdir.join('extra_plugin.py').write(
+        'from diligent import registry\n'
+        '@registry.register(name="Extra check", tags="extra")\n'
+        'def extra_check(series):\n'
+        '    yield "extra"\n')
+    monkeypatch.syspath_prepend(str(tmpdir))
+    # The diligent function shadows the module of the same name
+    monkeypatch.setattr(sys.modules['diligent.diligent'], 'get_entry_points',
+                        lambda group: [('extra', 'extra_plugin')])
+    # Keep the registry unchanged for other tests
+    monkeypatch.setattr(registry, '_plugins', None)
+    monkeypatch.setattr(registry, 'checks', registry.checks.copy())
+    monkeypatch.setattr(registry, 'loaded_plugins',
+                        set(registry.loaded_plugins))
+    monkeypatch.delitem(sys.modules, 'extra_plugin', raising=False)
+
+    registry.get_checks(exclude='extra')
+    assert 'extra_plugin' not in sys.modules
+    assert [str(c) for c in registry.get_checks(include='extra')] == [
+        'Extra check']
+    assert 'Extra check' not in [
+        str(c) for c in registry.get_checks(exclude='extra')]
+
+
+def test_check_module_attributes():
+    from diligent.checks import count_nan
+    from diligent.checks.basic import count_nan as basic_count_nan
+    assert count_nan is basic_count_nan
@@ -1,7 +1,11 @@
+import numpy as np
 import pandas as pd
 
+from diligent import registry
+
 from diligent.checks.nelson import (nelson_rule_1, nelson_rule_2, nelson_rule_3, nelson_rule_4,
-                     nelson_rule_5, nelson_rule_6, nelson_rule_7, nelson_rule_8)
+                     nelson_rule_5, nelson_rule_6, nelson_rule_7, nelson_rule_8,
+                     NelsonMonitor)
 
 
 def test_nelson_rule_1():
@@ -27,6 +31,11 @@ def test_nelson_rule_2():
     messages = list(nelson_rule_2(pd.Series(range(-4, 5)), mean=mean))
     assert len(messages) == 0
 
+    # A value equal to the mean ends the run
+    messages = list(nelson_rule_2(pd.Series([1] * 9 + [0, -1]), mean=mean))
+    assert messages == [
+        'At 0: 9 data points in sequence are above the mean of %s' % mean]
+
 
 def test_nelson_rule_3():
     messages = list(nelson_rule_3(pd.Series(range(6))))
@@ -52,6 +61,10 @@ def test_nelson_rule_4():
     messages = list(nelson_rule_4(pd.Series([0, 1, 0, 1, 1, 1, 1, 1, 0, 1, 0, 1, 0, 1])))
     assert len(messages) == 0
 
+    # Flat sequences do not alternate
+    messages = list(nelson_rule_4(pd.Series([0] * 14)))
+    assert len(messages) == 0
+
 
 def test_nelson_rule_5():
     mean = 0.0
@@ -118,3 +131,76 @@ def test_nelson_rule_8():
     messages = list(nelson_rule_8(pd.Series([2, 0, 2, -4, 6, 0, 7, 2]),
                                   mean=mean, std=std))
     assert len(messages) == 0
+
+
+def test_nelson_monitor_fixed_limits():
+    monitor = NelsonMonitor(mean=0.0, std=1.0)
+    assert monitor.update(0.5) == []
+    messages = monitor.update(3.5)
+    assert 'At 1: 3.5 is three standard deviations above the mean of 0.0' in messages
+
+
+def test_nelson_monitor_runs():
+    monitor = NelsonMonitor(mean=0.0, std=100.0, rules=[2])
+    messages = monitor.update_many(pd.Series(range(1, 12)))
+    assert messages == ['At 0: 9 data points in sequence are above the mean of 0.0']
+
+    monitor = NelsonMonitor(rules=[3])
+    messages = monitor.update_many(range(6))
+    assert messages == ['At 0: 6 data points in sequence are increasing']
+
+    monitor = NelsonMonitor(rules=[4])
+    messages = monitor.update_many([0, 1] * 8)
+    assert messages == ['At 0: 14 data points in sequence alternate in direction']
+
+
+def test_nelson_monitor_windows():
+    series = pd.Series([2, 1.1, 2, 0, 1.5])
+    monitor = NelsonMonitor(mean=0.0, std=1.0, rules=[6])
+    assert monitor.update_many(series) == list(
+        nelson_rule_6(series, mean=0.0, std=1.0))
+
+    monitor = NelsonMonitor(mean=0.0, std=1.0, rules=[7])
+    messages = monitor.update_many([0, 1, 0, 1, 0] * 4)
+    assert messages == ['At 0: 15 points in a row are all within 1 standard '
+                        'deviation of the mean on either side of the mean.']
+
+
+def test_nelson_monitor_running_stats():
+    monitor = NelsonMonitor(rules=[])
+    monitor.update_many([1, 2, 3, 4])
+    assert monitor.mean == 2.5
+    assert monitor.std == pd.Series([1, 2, 3, 4]).std()
+
+
+def test_nelson_rules_grouped():
+    series = pd.Series([0, 1, 2, 3, 4, 5, 6, 5, 4, 3, 2, 1, 0, 1, 5, 4, 3, 2, 1, 0])
+    groups = np.array([0] * 7 + [1] * 6 + [0] * 7)
+    for rule in (nelson_rule_1, nelson_rule_2, nelson_rule_3, nelson_rule_4,
+                 nelson_rule_5, nelson_rule_6, nelson_rule_7, nelson_rule_8):
+        check = registry.checks[rule]
+        expected = []
+        for code, group in series.groupby(groups):
+            expected.extend((code, m) for m in rule(group))
+        assert list(check.grouped(series, groups)) == expected
+
+
+def test_nelson_monitor_missing_values():
+    monitor = NelsonMonitor()
+    monitor.update_many([1, 2, np.nan, 0, 0, 0, 0, 0])
+    assert monitor.count == 7
+    assert not np.isnan(monitor.mean)
+    assert not np.isnan(monitor.std)
+    messages = monitor.update(1000.0)
+    assert any('three standard deviations above' in m for m in messages)
+
+    # A missing point breaks runs
+    monitor = NelsonMonitor(mean=0.0, std=100.0, rules=[2, 3])
+    assert monitor.update_many([1, 2, 3, 4, np.nan, 5, 6, 7, 8, 9]) == []
+    assert monitor.update(10) == [
+        'At 5: 6 data points in sequence are increasing']
+
+    # None is missing as well
+    monitor = NelsonMonitor()
+    assert monitor.update_many([1.0, None, 2.0]) == []
+    assert monitor.count == 2
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from diligent import registry
+from diligent.checks.sketch import approximate_duplicate_values, heavy_hitters
+from diligent.sketches import HyperLogLog, CountMinSketch, SpaceSaving
+
+
+def test_hyperloglog():
+    series = pd.Series(np.arange(20000) % 10000)
+    sketch = HyperLogLog()
+    sketch.update(series)
+    assert abs(sketch.count() - 10000) < 300
+
+    first, second = HyperLogLog(), HyperLogLog()
+    first.update(series[:10000])
+    second.update(series[10000:])
+    assert first.merge(second).count() == sketch.count()
+
+
+def test_count_min_sketch():
+    series = pd.Series(np.arange(10000) % 100)
+    sketch = CountMinSketch(width=64)
+    sketch.update(series)
+    estimates = sketch.estimate(pd.Series(np.arange(100)))
+    assert (estimates >= 100).all()
+
+
+def test_space_saving():
+    series = pd.Series(['a'] * 50 + ['b'] * 30 + list('cdefghij'))
+    summary = SpaceSaving(k=3)
+    summary.update(series[:40])
+    summary.update(series[40:])
+    top = summary.top()
+    assert [value for value, _, _ in top[:2]] == ['a', 'b']
+    for value, upper, error in top:
+        true_count = (series == value).sum()
+        assert upper - error <= true_count <= upper
+
+
+def test_sketch_checks():
+    series = pd.Series([1, 2, 2, 3, 3, 3, None])
+    messages = list(approximate_duplicate_values(series))
+    assert messages == ['About 3 distinct values, about 50.0% of 6 non-null '
+                        'values are duplicates']
+    messages = list(heavy_hitters(series, chunksize=2))
+    assert messages[0] == 'The value 3.0 appears about 3 times (at least 3)'
+
+
+def test_sketch_checks_are_opt_in():
+    names = [str(c) for c in registry.get_checks()]
+    assert 'Heavy hitters' not in names
+    assert 'Duplicate values' in names
+    names = [str(c) for c in registry.get_checks(include='sketch')]
+    assert names == ['Approximate duplicate values', 'Heavy hitters']
+    names = [str(c) for c in registry.get_checks(include='basic,sketch')]
+    assert 'Heavy hitters' in names and 'Duplicate values' in names